@@ -0,0 +1,79 @@
+"""
+    The coroutines behind blazeform.aio, separate so that their syntax is only
+    compiled on Python 3.5+.
+"""
+from __future__ import absolute_import
+import asyncio
+
+from blazeform.exceptions import UploadRejected
+from blazeform.file_upload_translators import StreamTranslator
+
+
+class ChunkReader(object):
+    """
+        An async iterator over the chunks returned by awaiting `read(size)`,
+        like Starlette's UploadFile.read, until it returns an empty chunk.
+    """
+
+    def __init__(self, read, chunk_size=64 * 1024):
+        self.read = read
+        self.chunk_size = chunk_size
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        chunk = await self.read(self.chunk_size)
+        if not chunk:
+            raise StopAsyncIteration
+        return chunk
+
+
+async def _write(dest, chunk):
+    if asyncio.iscoroutinefunction(dest.write):
+        await dest.write(chunk)
+    else:
+        await asyncio.get_event_loop().run_in_executor(None, dest.write, chunk)
+
+
+async def stream_upload(element, file_name, content_type, chunks, dest=None):
+    """
+        The async counterpart to FileElement.stream_upload(): reads an upload
+        from `chunks`, an async iterable of byte strings, checking `element`'s
+        rules as the data arrives.  Reading stops as soon as a rule is broken.
+        The resulting StreamTranslator is set as the element's submitted value
+        and returned.
+
+        Without `dest`, the upload is spooled like any other streamed upload.
+        Otherwise each accepted chunk is written to `dest` while the next one
+        is received and checked.  `dest` is a file-like object whose write()
+        is either a coroutine function (e.g. an aiofiles file) or a regular
+        method, which is then run in the loop's default executor.  Regular
+        files become the translator's `stream`; with async files the upload
+        is only available from `dest`.  Chunks accepted before a rule was
+        broken have been written to `dest`, so callers should discard it
+        when the translator has errors.
+    """
+    async_dest = dest is not None and asyncio.iscoroutinefunction(dest.write)
+    translator = StreamTranslator(file_name, content_type, element,
+                                  None if async_dest else dest)
+    pending = None
+    try:
+        if not translator.errors:
+            async for chunk in chunks:
+                if dest is None:
+                    translator.write(chunk)
+                    continue
+                translator.check(chunk)
+                if pending is not None:
+                    # one write at a time, so chunks arrive in order
+                    await pending
+                pending = asyncio.ensure_future(_write(dest, chunk))
+    except UploadRejected:
+        pass
+    finally:
+        if pending is not None:
+            await pending
+    translator.seek(0)
+    element.submittedval = translator
+    return translator
@@ -0,0 +1,16 @@
+"""
+    asyncio support for ASGI applications (Python 3.5+).  This module is not
+    imported by blazeform itself, import it directly:
+
+        from blazeform import aio
+
+        translator = await aio.stream_upload(form.elements.upload, upload.filename,
+                                             upload.content_type, aio.ChunkReader(upload.read))
+"""
+from __future__ import absolute_import
+import sys
+
+if sys.version_info < (3, 5):
+    raise ImportError('blazeform.aio needs Python 3.5+')
+
+from blazeform._aio import ChunkReader, stream_upload  # noqa: E402,F401
@@ -0,0 +1,92 @@
+from __future__ import absolute_import
+from collections import OrderedDict
+import hashlib
+import threading
+
+from blazeform.util import is_notgiven
+import six
+
+
+def fingerprint(value):
+    """
+        Returns a hashable, text based representation of `value` suitable for
+        building cache keys.  The type name is included so that, for example,
+        a literal and a plain string with the same text (which render
+        differently) do not produce the same fingerprint.
+    """
+    if is_notgiven(value):
+        return ('NotGiven',)
+    if isinstance(value, (list, tuple)):
+        return tuple(fingerprint(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((six.text_type(k), fingerprint(v)) for k, v in value.items()))
+    return (value.__class__.__name__, six.text_type(value))
+
+
+class LRUCache(object):
+    """
+        A thread safe, in-process, least recently used cache.  It only
+        implements the parts of the dict API that RenderCache needs.
+    """
+
+    def __init__(self, maxsize=500):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                return default
+            self._data[key] = value
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RenderCache(object):
+    """
+        Caches rendered output for static forms.  Whole forms are cached by a
+        key built from the form, its elements' render fingerprints and the
+        render settings.  Each element's rendered row is also cached on its
+        own, so when a form's key misses, only the elements whose values
+        changed are actually rendered.
+
+        `backend` can be any dict-like object that supports get() and item
+        assignment: an LRUCache (the default), a plain dict, or an adapter
+        for an external cache.  Keys are always strings, values are strings
+        or lists of strings.
+    """
+
+    def __init__(self, backend=None, fragments=True):
+        if backend is None:
+            backend = LRUCache()
+        self.backend = backend
+        #: cache element rows individually?
+        self.fragments = fragments
+
+    def key(self, *parts):
+        return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, value):
+        self.backend[key] = value
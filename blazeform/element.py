@@ -1,21 +1,29 @@
 from __future__ import absolute_import
-import inspect
 from os import path
-import cgi
 
-import formencode
-import formencode.validators as fev
-from blazeutils.datastructures import LazyOrderedDict
-from webhelpers2.html import HTML, tags, literal
-
-from blazeform.exceptions import ElementInvalid, ProgrammingError
-from blazeform.file_upload_translators import BaseTranslator
-from blazeform.processors import Confirm, Select, MultiValues, Wrapper, Decimal
+from blazeform.cache import fingerprint
+from blazeform.errors import FieldError, MessageTemplate, default_gettext, processor_error
+from blazeform.exceptions import ElementInvalid, ProgrammingError, UploadRejected
+from blazeform.file_upload_translators import BaseTranslator, StreamTranslator
 from blazeform.util import HtmlAttributeHolder, is_empty, multi_pop, NotGiven, \
-    tolist, NotGivenIter, is_notgiven, is_iterable, ElementRegistrar, is_given
+    tolist, NotGivenIter, is_notgiven, is_iterable, ElementRegistrar, is_given, display_value, \
+    is_blank, LazyModule, LazyOrderedDict
 import six
 from six.moves import map
 
+try:
+    from html import escape as escape_text
+except ImportError:  # Python 2
+    def escape_text(text, quote=False):
+        import cgi
+        return cgi.escape(text, quote)
+
+# imported when first validating or rendering, see LazyModule
+formencode = LazyModule('formencode')
+fev = LazyModule('formencode.validators')
+procs = LazyModule('blazeform.processors')
+markup = LazyModule('blazeform.markup')
+
 form_elements = {}
 
 
@@ -56,10 +64,11 @@ class Label(object):
         #: the value of the label
         self.value = value
 
-    def render(self, **kwargs):
+    def render(self, suffix='', **kwargs):
+        """ `suffix` is appended to the label's text, i.e. a colon """
         if isinstance(self.element, FormFieldElementBase):
             kwargs['for'] = self.element.getidattr()
-        return HTML.label(self.value, **kwargs)
+        return markup.HTML.label(self.value + suffix if suffix else self.value, **kwargs)
 
     def __call__(self, **kwargs):
         return self.render(**kwargs)
@@ -76,6 +85,16 @@ class ElementBase(HtmlAttributeHolder):
     """
 
     def __init__(self, form, eid, label=NotGiven, defaultval=NotGiven, **kwargs):
+        # cached id attributes, see getidattr()
+        self._idattrs = {}
+        self._idattrs_version = None
+        # cached _static_attributes() result
+        self._static_attrs = None
+        self._static_attrs_version = None
+        # cached (state, attribute html) for _attr_html() and _static_attr_html()
+        self._attr_html_cache = None
+        self._static_attr_html_cache = None
+
         # settings to overide the form's settings
         self.settings = kwargs.pop('settings', {})
         self.label_after = kwargs.pop('label_after', False)
@@ -86,14 +105,17 @@ class ElementBase(HtmlAttributeHolder):
         self._displayval = NotGiven
 
         self.id = eid
-        self.label = Label(self, label)
+        # headless forms don't render labels, so theirs are only built if used
+        self._label_value = label
+        self._label = None if form.headless else Label(self, label)
         self.form = form
 
         #: a list of user messages for this field (C{str})
         self.notes = []
 
         self.defaultval = defaultval
-        self.set_attr('id', self.getidattr())
+        if not form.headless:
+            self.set_attr('id', self.getidattr())
 
         # characteristics of this element
         self.is_defaultable = True
@@ -102,6 +124,17 @@ class ElementBase(HtmlAttributeHolder):
         self.is_returning = True
         self.renders_in_group = False
 
+    @property
+    def label(self):
+        if self._label is None:
+            self._label = Label(self, self._label_value)
+        return self._label
+
+    @label.setter
+    def label(self, label):
+        self._label = label
+        self._label_value = label.value
+
     @property
     def defaultval(self):
         return self._defaultval
@@ -120,13 +153,123 @@ class ElementBase(HtmlAttributeHolder):
     def _from_python_processing(self):
         self._displayval = self._defaultval
 
-    def getidattr(self):
-        return self.form._element_id_formatter % {'form_name': self.form._name,
-                                                  'element_id': self.id}
+    def _bind(self, form):
+        """
+            returns a copy of this element for `form`, which is a copy of this
+            element's form made by FormBase.bind()
+        """
+        el = object.__new__(self.__class__)
+        el.__dict__.update(self.__dict__)
+        el.form = form
+        el.attributes = self.attributes
+        if self._label is not None:
+            el._label = Label(el, self._label.value)
+        el.notes = list(self.notes)
+        el._idattrs = {}
+        el._idattrs_version = None
+        el._static_attrs_version = None
+        el._attr_html_cache = None
+        el._static_attr_html_cache = None
+        return el
+
+    def _bind_refs(self, bound):
+        """
+            called after all of a bound form's elements have been copied so
+            that references to other elements can be pointed at their copies.
+            `bound` maps id(original element) to its copy.
+        """
+        pass
+
+    def getidattr(self, suffix=None):
+        """
+            returns the HTML id of this element or, if `suffix` is given, the
+            id of one of its parts (i.e. the row or field wrapper).  Ids are
+            cached until the form's name or id formatter changes.
+        """
+        if self._idattrs_version != self.form._idattr_version:
+            self._idattrs = {}
+            self._idattrs_version = self.form._idattr_version
+        try:
+            return self._idattrs[suffix]
+        except KeyError:
+            pass
+        if suffix is None:
+            idattr = self.form._element_id_formatter % {'form_name': self.form._name,
+                                                        'element_id': self.id}
+        else:
+            idattr = '%s-%s' % (self.getidattr(), suffix)
+        self._idattrs[suffix] = idattr
+        return idattr
+
+    def _static_attributes(self, **kwargs):
+        """
+            the attributes to use when rendering statically.  Without `kwargs`,
+            they are cached until this element's attributes change.  Don't
+            modify the returned dict.
+        """
+        if kwargs:
+            return self._build_static_attributes(self.render_attrs(**kwargs))
+        if self._static_attrs_version != self.attributes.version:
+            self._static_attrs = self._build_static_attributes(self.render_attrs())
+            self._static_attrs_version = self.attributes.version
+        return self._static_attrs
+
+    def _build_static_attributes(self, attrs):
+        """ `attrs` is a copy from render_attrs() and can be modified """
+        return attrs
+
+    def _render_attrs_state(self):
+        """
+            anything besides this element's attributes that render_attrs()
+            depends on, used to invalidate the _attr_html() cache
+        """
+        return None
+
+    def _attr_html(self, **kwargs):
+        """
+            render_attrs() escaped into attribute html (see markup.attr_html())
+            for markup.tag().  Without `kwargs`, it is cached until this
+            element's attributes change.
+        """
+        if kwargs:
+            return markup.attr_html(self.render_attrs(**kwargs))
+        state = (self.attributes.version, self._render_attrs_state())
+        cached = self._attr_html_cache
+        if cached is None or cached[0] != state:
+            cached = self._attr_html_cache = (state, markup.attr_html(self.render_attrs()))
+        return cached[1]
+
+    def _static_attr_html(self, **kwargs):
+        " like _attr_html(), but for _static_attributes() "
+        if kwargs:
+            return markup.attr_html(self._static_attributes(**kwargs))
+        version = self.attributes.version
+        cached = self._static_attr_html_cache
+        if cached is None or cached[0] != version:
+            cached = self._static_attr_html_cache = \
+                (version, markup.attr_html(self._static_attributes()))
+        return cached[1]
+
+    def render_fingerprint(self):
+        """
+            a tuple of everything that affects this element's rendered output,
+            used to build render cache keys.  Subclasses that render other
+            state should extend it.
+        """
+        return (
+            self.__class__.__name__,
+            self.getidattr(),
+            fingerprint(self.attributes),
+            fingerprint(self.label.value),
+            self.label_after,
+            fingerprint(self.notes),
+            fingerprint(self.settings),
+            fingerprint(self.displayval),
+        )
 
     def add_note(self, note, escape=True):
         if escape:
-            note = cgi.escape(note)
+            note = escape_text(note, quote=False)
         self.notes.append(note)
 
 
@@ -147,6 +290,10 @@ class FormFieldElementBase(HasValueElement):
     Base class for form elements that represent form fields (input, select, etc.)
     as opposed to Elements that are only for display (i.e. static, headers).
     """
+    #: does this element set a submitted value from _missing_submittedval()
+    #: when nothing was submitted for it?  Browsers leave out unchecked
+    #: checkboxes and unselected multi-selects, for example.
+    _submit_missing = False
 
     def __init__(self, form, eid, label=NotGiven, vtype=NotGiven, defaultval=NotGiven, strip=True,
                  **kwargs):
@@ -164,10 +311,13 @@ class FormFieldElementBase(HasValueElement):
 
         self._submittedval = NotGiven
         self._safeval = NotGiven
-        #: a list of error messages for this field (C{str})
-        self.errors = []
+        # FieldError records for this field's errors, see errors below
+        self._errors = []
         #: validators/converters
         self.processors = []
+        # MultiValues wrappers for our processors by id(processor), they are
+        # stateless, so they are shared with bound copies of this element
+        self._multivalues = {}
         #: whether or not this field is valid, None means the field has not been processed yet
         self._valid = None
         #: allows a form/element to "expect" an exception and handle gracefully
@@ -194,6 +344,32 @@ class FormFieldElementBase(HasValueElement):
         kwargs['name'] = name
         HasValueElement.set_attrs(self, **kwargs)
 
+    def render_attrs(self, **kwargs):
+        name = kwargs.pop('name', None)
+        if not name:
+            name = self.nameattr or self.id
+        kwargs['name'] = name
+        return HasValueElement.render_attrs(self, **kwargs)
+
+    def _render_attrs_state(self):
+        return self.nameattr
+
+    @property
+    def nameattr(self):
+        return self._nameattr
+
+    @nameattr.setter
+    def nameattr(self, value):
+        self._nameattr = value
+        # forms map submitted values to elements by name
+        form = getattr(self, 'form', None)
+        if form is not None:
+            form._elements_changed()
+
+    def _missing_submittedval(self, values):
+        " the submitted value when the form's submitted `values` have none for us "
+        return None
+
     @property
     def submittedval(self):
         return self._submittedval
@@ -201,9 +377,24 @@ class FormFieldElementBase(HasValueElement):
     @submittedval.setter
     def submittedval(self, value):
         self._valid = None
-        self.errors = []
+        self._errors = []
         self._submittedval = value
 
+    @property
+    def errors(self):
+        "a list of error messages for this field (C{str}), see also iter_errors()"
+        return [error.message for error in self._errors]
+
+    @errors.setter
+    def errors(self, errors):
+        self._errors = []
+        for error in errors:
+            self.add_error(error)
+
+    def iter_errors(self):
+        "yields this field's errors as FieldError records, without formatting their messages"
+        return iter(self._errors)
+
     @property
     def displayval(self):
         if is_notgiven(self.submittedval):
@@ -233,6 +424,19 @@ class FormFieldElementBase(HasValueElement):
     def required_empty_test(self, value):
         return is_empty(value)
 
+    def _standardize_empty(self, value):
+        """
+            Returns `value` and whether it is empty, with empty values replaced
+            by if_empty, or None if there is no if_empty (NotGiven is kept).
+        """
+        if not is_empty(value):
+            return value, False
+        if self.if_empty is not NotGiven:
+            return self.if_empty, is_empty(self.if_empty)
+        if not is_notgiven(value):
+            return None, True
+        return value, True
+
     def _to_python_processing(self):  # noqa
         """
         filters, validates, and converts the submitted value based on
@@ -263,22 +467,20 @@ class FormFieldElementBase(HasValueElement):
         if is_notgiven(value) and self.if_missing is not NotGiven:
             value = self.if_missing
 
-        # handle empty or missing submit value with if_empty
-        if is_empty(value) and self.if_empty is not NotGiven:
-            value = self.if_empty
-        # standardize all empty values as None if if_empty not given
-        elif is_empty(value) and not is_notgiven(value):
-            value = None
+        value = self._standardize_empty(value)[0]
 
         # process required
         if self.required and self.required_empty_test(value):
             valid = False
-            self.add_error('field is required')
+            self.add_error(self._required_error())
 
         # process processors
         for processor, msg in self.processors:
             try:
-                processor = MultiValues(processor)
+                wrapped = self._multivalues.get(id(processor))
+                if wrapped is None or wrapped.validator is not processor:
+                    wrapped = self._multivalues[id(processor)] = procs.MultiValues(processor)
+                processor = wrapped
                 ap_value = processor.to_python(value, self)
 
                 # FormEncode takes "empty" values and returns None
@@ -288,7 +490,7 @@ class FormFieldElementBase(HasValueElement):
                     value = ap_value
             except formencode.Invalid as e:
                 valid = False
-                self.add_error((msg or str(e)))
+                self.add_error(processor_error(self.id, processor, e, msg, self.form.catalog))
         else:
             # we rely on MultiValues for this, but if no processor,
             # it doesn't get called
@@ -296,26 +498,21 @@ class FormFieldElementBase(HasValueElement):
                 value = tolist(value)
 
         ###
-        # Doing these again in case the processors changed the value
+        # Doing this again in case the processors changed the value
         ###
-        # handle empty or missing submit value with if_empty
-        if is_empty(value) and self.if_empty is not NotGiven:
-            value = self.if_empty
-        # standardize all empty values as None if if_empty not given
-        elif is_empty(value) and not is_notgiven(value):
-            value = None
+        value, empty = self._standardize_empty(value)
 
         # process required
         if self.required and self.required_empty_test(value) and \
-                'field is required' not in self.errors:
+                not any(error.code == 'required' for error in self._errors):
             valid = False
-            self.add_error('field is required')
+            self.add_error(self._required_error())
 
         # If its empty, there is no reason to run the converters.  By default,
         # the validators don't do anything if the value is empty and they WILL
         # try to convert our NotGiven value, which we want to avoid.  Therefore,
         # just skip the conversion.
-        if not is_empty(value):
+        if not empty:
             # process type conversion
             if self.vtype is not NotGiven:
                 if self.vtype in ('boolean', 'bool'):
@@ -325,17 +522,18 @@ class FormFieldElementBase(HasValueElement):
                 elif self.vtype in ('number', 'num', 'float'):
                     tvalidator = fev.Number
                 elif self.vtype in ('decimal'):
-                    tvalidator = Decimal
+                    tvalidator = procs.Decimal
                 elif self.vtype in ('str', 'string'):
                     tvalidator = fev.String
                 elif self.vtype in ('unicode', 'uni'):
                     tvalidator = fev.UnicodeString
                 try:
-                    tvalidator = MultiValues(tvalidator, multi_check=False)
+                    tvalidator = procs.MultiValues(tvalidator, multi_check=False)
                     value = tvalidator.to_python(value, self)
                 except formencode.Invalid as e:
                     valid = False
-                    self.add_error(str(e))
+                    self.add_error(processor_error(self.id, tvalidator, e,
+                                                   catalog=self.form.catalog))
 
         # save
         if valid:
@@ -358,19 +556,66 @@ class FormFieldElementBase(HasValueElement):
         self._to_python_processing()
         return self._valid
 
-    def add_error(self, error):
-        self.errors.append(error)
+    def _bind(self, form):
+        el = HasValueElement._bind(self, form)
+        el._errors = list(self._errors)
+        el.processors = list(self.processors)
+        el.exception_handlers = list(self.exception_handlers)
+        return el
+
+    def render_fingerprint(self):
+        return HasValueElement.render_fingerprint(self) + (
+            self.required,
+            self.nameattr,
+            fingerprint(self.errors),
+        )
+
+    def _clear_submitted(self):
+        "forget the submitted value, for forms that are submitted more than once"
+        self._submittedval = NotGiven
+        self._safeval = NotGiven
+        self._valid = None
+        self._errors = []
+
+    def _(self, template, **kwargs):
+        """
+            FormEncode's translation hook: validators call `state._` with
+            their message templates and the element is the state.  The
+            template returned keeps track of the message key and parameters
+            for the error records.  Without a catalog, templates are
+            translated the way FormEncode would, see default_gettext().
+        """
+        catalog = self.form.catalog
+        if catalog is None:
+            return MessageTemplate(default_gettext(template, **kwargs), template)
+        return MessageTemplate(catalog.gettext(template), template)
+
+    def _error(self, code, template, params=None):
+        "a FieldError for this element, translated with the form's catalog"
+        return FieldError(self.id, code, template, params, catalog=self.form.catalog)
+
+    def _required_error(self):
+        return self._error('required', 'field is required')
+
+    def add_error(self, error, code='invalid'):
+        """
+            Adds a FieldError to this element's errors.  `error` is either a
+            FieldError or a message, which gets `code`.
+        """
+        if not isinstance(error, FieldError):
+            error = self._error(code, error)
+        self._errors.append(error)
 
     def add_processor(self, processor, msg=None):
         if not formencode.is_validator(processor):
             if callable(processor):
-                processor = Wrapper(to_python=processor)
+                processor = procs.Wrapper(to_python=processor)
             else:
                 raise TypeError('processor must be a Formencode validator or a callable')
         else:
             # FE validators may be passed as the class or an instance
             #   if class, then make it an instance
-            if inspect.isclass(processor):
+            if isinstance(processor, six.class_types):
                 processor = processor()
 
         self.processors.append((processor, msg))
@@ -425,21 +670,22 @@ class InputElementBase(FormFieldElementBase):
     def __call__(self, **kwargs):
         return self.render(**kwargs)
 
+    def render_fingerprint(self):
+        return FormFieldElementBase.render_fingerprint(self) + (self.etype,)
+
     def render(self, **kwargs):
-        self.set_attrs(**kwargs)
         if self.form._static:
-            return self.render_static()
+            return self.render_static(**kwargs)
         else:
-            return self.render_html()
-
-    def render_html(self):
-        if (self.displayval or self.displayval == 0) and self.displayval is not NotGiven:
-            self.set_attr('value', self.displayval)
-        return HTML.input(type=self.etype, **self.attributes)
+            return self.render_html(**kwargs)
 
-    def _static_attributes(self):
-        attrs = self.attributes.copy()
+    def render_html(self, **kwargs):
+        displayval = display_value(self.displayval)
+        if displayval is not None:
+            return markup.tag('input', self._attr_html(**kwargs), type=self.etype, value=displayval)
+        return markup.tag('input', self._attr_html(**kwargs), type=self.etype)
 
+    def _build_static_attributes(self, attrs):
         try:
             del attrs['name']
         except KeyError:
@@ -455,15 +701,13 @@ class InputElementBase(FormFieldElementBase):
         attrs['class'] = attrs['class'] + ' static'
         return attrs
 
-    def render_static(self):
+    def render_static(self, **kwargs):
         if self.etype in ('button', 'file', 'hidden', 'image', 'submit',
                           'reset', 'password'):
             return ''
-        if self.displayval == '':
-            todisplay = literal('&nbsp;')
-        else:
-            todisplay = self.displayval
-        return HTML.span(todisplay, **self._static_attributes())
+        displayval = self.displayval
+        todisplay = markup.literal('&nbsp;') if is_blank(displayval) else displayval
+        return markup.tag('span', self._static_attr_html(**kwargs), todisplay)
 
 
 class ButtonElement(InputElementBase):
@@ -478,6 +722,7 @@ form_elements['button'] = ButtonElement
 
 
 class CheckboxElement(InputElementBase):
+    _submit_missing = True
 
     def __init__(self, form, eid, label=NotGiven, vtype=NotGiven, defaultval=NotGiven, strip=True,
                  **kwargs):
@@ -500,7 +745,7 @@ class CheckboxElement(InputElementBase):
     @submittedval.setter
     def submittedval(self, value):
         self._valid = None
-        self.errors = []
+        self._errors = []
 
         # this is really not correct, submitted values should be strings only.  But the library
         # was built this way to begin with and for BC reasons, I'm keeping it for now.
@@ -521,26 +766,20 @@ class CheckboxElement(InputElementBase):
         return self.render(**kwargs)
 
     def render(self, **kwargs):
-        self.set_attrs(**kwargs)
         if self.form._static:
-            return self.render_static()
+            return self.render_static(**kwargs)
         else:
-            return self.render_html()
+            return self.render_html(**kwargs)
 
-    def render_html(self):
+    def render_html(self, **kwargs):
         # have to override InputBase.render or it will put a value attribute
         # for a checkbox
-        if self.displayval and self.displayval is not NotGiven:
-            self.set_attr('checked', 'checked')
-        else:
-            try:
-                self.del_attr('checked')
-            except KeyError:
-                pass
-        return HTML.input(type=self.etype, **self.attributes)
+        checked = 'checked' if self.displayval else None
+        return markup.tag('input', self._attr_html(**kwargs), type=self.etype, checked=checked)
 
-    def render_static(self):
-        return HTML.span('yes' if self.displayval else 'no', **self._static_attributes())
+    def render_static(self, **kwargs):
+        return markup.tag('span', self._static_attr_html(**kwargs),
+                          'yes' if self.displayval else 'no')
 
 
 form_elements['checkbox'] = CheckboxElement
@@ -559,6 +798,8 @@ class FileElement(InputElementBase):
         self._denied_exts = []
         self._denied_types = []
         self._maxsize = NotGiven
+        self._verify_type = False
+        self._hash_name = None
 
         # characterstics of this element
         self.is_defaultable = False
@@ -579,14 +820,26 @@ class FileElement(InputElementBase):
     @submittedval.setter
     def submittedval(self, value):
         self._valid = None
-        self.errors = []
+        self._errors = []
         if isinstance(value, BaseTranslator):
             self._submittedval = value
-        elif isinstance(value, six.string_types):
+        elif isinstance(getattr(value, 'stream', None), StreamTranslator):
+            # a Werkzeug FileStorage for an upload read with our stream_factory()
+            self._submittedval = value.stream
+        elif value is None or is_notgiven(value) or isinstance(value, six.string_types):
+            # no upload, e.g. an API client sending null for the field
             self._submittedval = NotGiven
         else:
             self._submittedval = self.form._fu_translator(value)
 
+    def _bind(self, form):
+        el = InputElementBase._bind(self, form)
+        el._allowed_exts = list(self._allowed_exts)
+        el._allowed_types = list(self._allowed_types)
+        el._denied_exts = list(self._denied_exts)
+        el._denied_types = list(self._denied_types)
+        return el
+
     def maxsize(self, size):
         "set the maximum allowed file upload size"
         self._maxsize = size
@@ -607,60 +860,133 @@ class FileElement(InputElementBase):
         "denied mime type strings"
         self._denied_types.extend(args)
 
+    def verify_type(self, verify=True):
+        """
+            also apply the mime type rules to the type sniffed from the
+            contents of streamed uploads, not just the type the browser sent
+        """
+        self._verify_type = verify
+
+    def hash_uploads(self, hash_name='sha256'):
+        "hash streamed uploads as they arrive with the given hashlib algorithm"
+        self._hash_name = hash_name
+
+    def stream_upload(self, file_name, content_type, chunks, dest=None):
+        """
+            Read an upload from `chunks`, an iterable of byte strings, checking
+            this element's rules as the data arrives.  Reading stops as soon as
+            a rule is broken.  The resulting StreamTranslator is set as this
+            element's submitted value and returned.
+        """
+        translator = StreamTranslator(file_name, content_type, self, dest)
+        translator.feed(chunks)
+        self.submittedval = translator
+        return translator
+
+    def stream_factory(self, total_content_length, content_type, filename, content_length=None):
+        """
+            Can be given to Werkzeug as the `stream_factory` when parsing form
+            data so the upload is checked while it is being parsed.  If it is
+            rejected, Werkzeug stops parsing and UploadRejected is raised.
+            Give the exception's translator to this element as its submitted
+            value to get the errors:
+
+                try:
+                    files = request.files
+                except UploadRejected as e:
+                    form.elements.upload.submittedval = e.translator
+        """
+        translator = StreamTranslator(filename, content_type, self)
+        if content_length:
+            translator.errors.extend(self._check_size(content_length))
+        if translator.errors:
+            raise UploadRejected(translator)
+        return translator
+
+    def _check_name(self, file_name):
+        errors = []
+        _, ext = path.splitext(file_name)
+        ext = ext.lower()
+        if not ext and (self._allowed_exts or self._denied_exts):
+            errors.append(self._error('noExtension', 'extension requirement exists, but '
+                                      'submitted file had no extension'))
+
+        if self._allowed_exts and ext not in self._allowed_exts:
+            errors.append(self._error('extension',
+                                      'extension "%(ext)s" not allowed', {'ext': ext}))
+
+        if self._denied_exts and ext in self._denied_exts:
+            errors.append(self._error('deniedExtension',
+                                      'extension "%(ext)s" not permitted', {'ext': ext}))
+        return errors
+
+    def _check_type(self, content_type):
+        errors = []
+        if content_type:
+            if self._allowed_types and content_type not in self._allowed_types:
+                errors.append(self._error('contentType',
+                                          'content type "%(type)s" not allowed',
+                                          {'type': content_type}))
+
+            if self._denied_types and content_type in self._denied_types:
+                errors.append(self._error('deniedContentType',
+                                          'content type "%(type)s" not permitted',
+                                          {'type': content_type}))
+        elif content_type is not None and (self._allowed_types or self._denied_types):
+            errors.append(self._error('noContentType', 'content-type requirements '
+                                      'exist, but submitted file had no content-type'))
+        return errors
+
+    def _check_sniffed_type(self, sniffed_type, content_type):
+        if sniffed_type is None:
+            if self._allowed_types:
+                return [self._error('unknownContentType', 'content type could not be '
+                                    'determined from the file contents')]
+            return []
+        # plain text has no magic number, so go with the type sent for text files
+        if sniffed_type == 'text/plain' and content_type and content_type.startswith('text/'):
+            return []
+        return self._check_type(sniffed_type)
+
+    def _check_size(self, content_length):
+        if self._maxsize and content_length > self._maxsize:
+            return [self._error('tooBig', 'file too big (%(size)s), max size %(max)s',
+                                {'size': content_length, 'max': self._maxsize})]
+        return []
+
     def _to_python_processing(self):
         # if the value has already been processed, don't process it again
         if self._valid is not None:
             return
 
-        valid = True
         value = self.submittedval
 
         if is_notgiven(value):
             value = BaseTranslator(None, None, 0)
 
         if value.is_uploaded:
-            _, ext = path.splitext(value.file_name)
-            ext = ext.lower()
-            if not ext and (self._allowed_exts or self._denied_exts):
-                valid = False
-                self.add_error('extension requirement exists, but submitted file had no extension')
-
-            if self._allowed_exts and ext not in self._allowed_exts:
-                valid = False
-                self.add_error('extension "%s" not allowed' % ext)
-
-            if self._denied_exts and ext in self._denied_exts:
-                valid = False
-                self.add_error('extension "%s" not permitted' % ext)
-
-            if value.content_type:
-                if self._allowed_types and value.content_type not in self._allowed_types:
-                    valid = False
-                    self.add_error('content type "%s" not allowed' % value.content_type)
-
-                if self._denied_types and value.content_type in self._denied_types:
-                    valid = False
-                    self.add_error('content type "%s" not permitted' % value.content_type)
-            elif value.content_type is not None and (self._allowed_types or self._denied_types):
-                valid = False
-                self.add_error('content-type requirements exist, but submitted file had '
-                               'no content-type')
-
-            if self._maxsize:
-                if not value.content_length:
-                    valid = False
-                    self.add_error('maximum size requirement exists, but submitted file had '
-                                   'no content length')
-                elif value.content_length > self._maxsize:
-                    valid = False
-                    self.add_error('file too big (%s), max size %s' %
-                                   (value.content_length, self._maxsize))
+            if getattr(value, 'checked', False):
+                # rules were already applied while the upload was streamed
+                value.finish()
+                errors = list(value.errors)
+            else:
+                errors = self._check_name(value.file_name)
+                errors.extend(self._check_type(value.content_type))
+                if self._maxsize and not value.content_length:
+                    errors.append(self._error('noContentLength', 'maximum size '
+                                              'requirement exists, but submitted file had no '
+                                              'content length'))
+                else:
+                    errors.extend(self._check_size(value.content_length))
         elif self.required:
-            valid = False
-            self.add_error('field is required')
+            errors = [self._required_error()]
+        else:
+            errors = []
 
-        self._valid = valid
-        if valid:
+        for error in errors:
+            self.add_error(error)
+        self._valid = not errors
+        if self._valid:
             self._safeval = self.submittedval
 
     def add_processor(self, processor, msg=None):
@@ -786,7 +1112,10 @@ class ConfirmElement(TextElement):
             # class attribute set already, override that too
             self.set_attr('class_', 'password')
 
-        self.add_processor(Confirm(self.mel))
+        self.add_processor(procs.Confirm(self.mel))
+
+    def _bind_refs(self, bound):
+        self.mel = bound.get(id(self.mel), self.mel)
 
     @property
     def displayval(self):
@@ -794,7 +1123,7 @@ class ConfirmElement(TextElement):
             return None
         return super(ConfirmElement, self).displayval
 
-    def render_static(self):
+    def render_static(self, **kwargs):
         return ''
 
 
@@ -871,15 +1200,15 @@ class URLElement(TextElement):
         TextElement.__init__(self, form, eid, label, vtype, defaultval, strip, **kwargs)
         self.add_processor(fev.URL(**vargs))
 
-    def render_static(self):
-        if self.displayval == '':
-            todisplay = literal('&nbsp;')
+    def render_static(self, **kwargs):
+        displayval = self.displayval
+        if is_blank(displayval):
+            todisplay = markup.literal('&nbsp;')
+        elif displayval.startswith('http:') or displayval.startswith('https:'):
+            todisplay = markup.tags.link_to(displayval, displayval)
         else:
-            if self.displayval.startswith('http:') or self.displayval.startswith('https:'):
-                todisplay = tags.link_to(self.displayval, self.displayval)
-            else:
-                todisplay = self.displayval
-        return HTML.span(todisplay, **self._static_attributes())
+            todisplay = displayval
+        return markup.tag('span', self._static_attr_html(**kwargs), todisplay)
 
 
 form_elements['url'] = URLElement
@@ -900,6 +1229,8 @@ class SelectElement(FormFieldElementBase):
                                       vtype, defaultval, strip, required=required, **kwargs)
 
         self.options = options
+        # cached (options, option html) for _options_html()
+        self._options_html_cache = None
         self.choose = None
         if choose:
             if isinstance(choose, list):
@@ -914,11 +1245,11 @@ class SelectElement(FormFieldElementBase):
         if auto_validate:
             choose_as_none = [cv[0] for cv in tolist(self.choose)]
             if required:
-                self.add_processor(Select(self.options, invalid, choose_as_none), error_msg)
+                self.add_processor(procs.Select(self.options, invalid, choose_as_none), error_msg)
             else:
                 # NotGiven is a valid option as long as a value isn't required
                 ok_values = self.options + [(NotGiven, 0)] + [(NotGivenIter, 0)]
-                self.add_processor(Select(ok_values, invalid, choose_as_none), error_msg)
+                self.add_processor(procs.Select(ok_values, invalid, choose_as_none), error_msg)
 
     def __call__(self, **kwargs):
         return self.render(**kwargs)
@@ -937,8 +1268,23 @@ class SelectElement(FormFieldElementBase):
         """ no name attribute b/c select tag takes it directly """
         HasValueElement.set_attrs(self, **kwargs)
 
-    def _static_attributes(self):
-        attrs = self.attributes.copy()
+    def render_fingerprint(self):
+        return FormFieldElementBase.render_fingerprint(self) + (
+            self.multiple,
+            fingerprint(self.options),
+        )
+
+    def render_attrs(self, **kwargs):
+        """ no name attribute b/c select tag takes it directly """
+        attrs = HasValueElement.render_attrs(self, **kwargs)
+        if self.multiple:
+            attrs.setdefault('multiple', 'multiple')
+        return attrs
+
+    def _render_attrs_state(self):
+        return self.multiple
+
+    def _build_static_attributes(self, attrs):
         try:
             del attrs['name']
         except KeyError:
@@ -947,33 +1293,56 @@ class SelectElement(FormFieldElementBase):
             del attrs['multiple']
         except KeyError:
             pass
+        if 'class' in attrs:
+            attrs['class'] = attrs['class'] + ' select'
+        else:
+            attrs['class'] = 'select'
         return attrs
 
     def render(self, **kwargs):
-        if self.multiple:
-            self.set_attr('multiple', 'multiple')
-        self.set_attrs(**kwargs)
         if self.form._static:
-            return self.render_static()
+            return self.render_static(**kwargs)
         else:
-            return self.render_html()
+            return self.render_html(**kwargs)
 
-    def render_html(self):
-        def option_tag(opt):
+    def _options_html(self):
+        """
+            a list of (value, html) pairs with each option's value as text and
+            its unselected <option> tag, with a trailing newline.  Cached until
+            the options change.
+        """
+        options = list(self.options)
+        cached = self._options_html_cache
+        if cached is not None and cached[0] == options:
+            return cached[1]
+        options_html = []
+        for opt in options:
             if isinstance(opt, (list, tuple)):
                 value, label = opt
             else:
                 value = label = opt
-            return tags.Option(label, six.text_type(value))
+            value = six.text_type(value)
+            options_html.append((value, markup.option_html % (markup.escape(value),
+                                                              markup.escape(label))))
+        self._options_html_cache = (options, options_html)
+        return options_html
 
-        displayval = self.displayval if self.displayval or self.displayval == 0 else None
-        displayval = [six.text_type(val) for val in tolist(displayval)]
-        options = [option_tag(opt) for opt in self.options]
-        return tags.select(self.nameattr or self.id, displayval, options, **self.attributes)
+    def render_html(self, **kwargs):
+        displayval = display_value(self.displayval)
+        selected = set(six.text_type(val) for val in tolist(displayval))
+        # attributes are sorted, so "selected" always comes right after the tag name
+        start, start_len = markup.selected_option_start, markup.option_start_len
+        options = markup.literal(''.join([
+            start + html[start_len:] if value in selected else html
+            for value, html in self._options_html()
+        ]))
+        return markup.tag('select', self._attr_html(**kwargs), markup.HTML.NL, options,
+                          name=kwargs.get('name') or self.nameattr or self.id)
 
-    def render_static(self):
-        if self.displayval == '':
-            todisplay = literal('&nbsp;')
+    def render_static(self, **kwargs):
+        displayval = self.displayval
+        if is_blank(displayval):
+            todisplay = markup.literal('&nbsp;')
         else:
             values = []
 
@@ -983,21 +1352,21 @@ class SelectElement(FormFieldElementBase):
                 else:
                     return six.text_type(option), option
             lookup = dict(map(mapf, self.options))
-            for key in tolist(self.displayval):
+            for key in tolist(displayval):
                 try:
                     values.append(lookup[six.text_type(key)])
                 except KeyError:
                     pass
             todisplay = ', '.join(values)
 
-        self.add_attr('class', 'select')
-        return HTML.span(todisplay, **self._static_attributes())
+        return markup.tag('span', self._static_attr_html(**kwargs), todisplay)
 
 
 form_elements['select'] = SelectElement
 
 
 class MultiSelectElement(SelectElement):
+    _submit_missing = True
 
     def __init__(self, form, eid, options, label=NotGiven, vtype=NotGiven,
                  defaultval=NotGiven, strip=True, choose='Choose:',
@@ -1036,8 +1405,11 @@ class TextAreaElement(FormFieldElementBase, MaxLengthMixin):
         """ no name attribute b/c textarea tag takes it directly """
         HasValueElement.set_attrs(self, **kwargs)
 
-    def _static_attributes(self):
-        attrs = self.attributes.copy()
+    def render_attrs(self, **kwargs):
+        """ no name attribute b/c textarea tag takes it directly """
+        return HasValueElement.render_attrs(self, **kwargs)
+
+    def _build_static_attributes(self, attrs):
         try:
             del attrs['rows']
         except KeyError:
@@ -1050,26 +1422,27 @@ class TextAreaElement(FormFieldElementBase, MaxLengthMixin):
             del attrs['maxlength']
         except KeyError:
             pass
+        if 'class' in attrs:
+            attrs['class'] = attrs['class'] + ' textarea'
+        else:
+            attrs['class'] = 'textarea'
         return attrs
 
     def render(self, **kwargs):
-        self.set_attrs(**kwargs)
         if self.form._static:
-            return self.render_static()
+            return self.render_static(**kwargs)
         else:
-            return self.render_html()
+            return self.render_html(**kwargs)
 
-    def render_html(self):
-        displayval = self.displayval if self.displayval or self.displayval == 0 else ''
-        return tags.textarea(self.nameattr or self.id, displayval, **self.attributes)
+    def render_html(self, **kwargs):
+        displayval = display_value(self.displayval, '')
+        return markup.tag('textarea', self._attr_html(**kwargs), displayval,
+                          name=kwargs.get('name') or self.nameattr or self.id)
 
-    def render_static(self):
-        self.add_attr('class', 'textarea')
-        if self.displayval == '':
-            todisplay = literal('&nbsp;')
-        else:
-            todisplay = self.displayval
-        return HTML.span(todisplay, **self._static_attributes())
+    def render_static(self, **kwargs):
+        displayval = self.displayval
+        todisplay = markup.literal('&nbsp;') if is_blank(displayval) else displayval
+        return markup.tag('span', self._static_attr_html(**kwargs), todisplay)
 
 
 form_elements['textarea'] = TextAreaElement
@@ -1079,6 +1452,7 @@ class LogicalGroupElement(FormFieldElementBase):
     """
         Used to support MultiCheckboxElement and RadioElement
     """
+    _submit_missing = True
 
     def __init__(self, is_multiple, form, eid, label=NotGiven, vtype=NotGiven,
                  defaultval=NotGiven, strip=True, **kwargs):
@@ -1087,6 +1461,9 @@ class LogicalGroupElement(FormFieldElementBase):
         self.invalid = kwargs.pop('invalid', [])
         self.submittedval = NotGivenIter
         self.members = {}
+        # members by their value as text, and the values of the chosen members
+        self._member_index = {}
+        self._chosen_keys = set()
         FormFieldElementBase.__init__(self, form, eid, label, vtype, defaultval, strip, **kwargs)
 
         self.multiple = is_multiple
@@ -1120,7 +1497,7 @@ class LogicalGroupElement(FormFieldElementBase):
     @submittedval.setter
     def submittedval(self, value):
         self._valid = None
-        self.errors = []
+        self._errors = []
         self._submittedval = value
 
         # use self.value to make sure processing gets done
@@ -1135,33 +1512,39 @@ class LogicalGroupElement(FormFieldElementBase):
         if self.to_python_first:
             self.to_python_first = False
             if self.auto_validate:
-                options = list(self.members.items())
-                if self.required:
-                    self.add_processor(Select(options, self.invalid), self.error_msg)
-                else:
-                    # NotGiven is a valid option as long as a value isn't required
-                    self.add_processor(Select(options + [(NotGivenIter, 0)], self.invalid),
-                                       self.error_msg)
+                # NotGiven is a valid option as long as a value isn't required
+                self.add_processor(procs.GroupMembers(self.invalid, not self.required),
+                                   self.error_msg)
         FormFieldElementBase._to_python_processing(self)
 
     def _set_members(self, values):
-        # convert to dict with unicode keys so our comparisons are always
-        # the same type
-        values = dict([(six.text_type(v), 1) for v in tolist(values)])
-
-        # based on our values, set our members to chosen or not chosen
-        for key, el in self.members.items():
-            if six.text_type(key) in values:
+        # compare as text so our comparisons are always the same type
+        values = set([six.text_type(v) for v in tolist(values)])
+
+        # only members whose state changes need to be updated
+        for key in self._chosen_keys - values:
+            self._member_index[key].chosen = False
+        for key in values - self._chosen_keys:
+            el = self._member_index.get(key)
+            if el is not None:
                 el.chosen = True
-            else:
-                el.chosen = False
+
+    def _bind_refs(self, bound):
+        self.members = dict((key, bound.get(id(el), el)) for key, el in self.members.items())
+        self.mbrs = self.members
+        self._member_index = dict((key, bound.get(id(el), el))
+                                  for key, el in self._member_index.items())
+        self._chosen_keys = set(self._chosen_keys)
 
     def add_member(self, el):
-        if el.displayval in self.members:
+        key = six.text_type(el.displayval)
+        if el.displayval in self.members or key in self._member_index:
             raise ValueError(
                 'a member of this group already exists with value "%s"' % el.displayval
             )
         self.members[el.displayval] = el
+        self._member_index[key] = el
+        el._lgroup_key = key
 
 
 class PassThruElement(HasValueElement):
@@ -1211,8 +1594,7 @@ class FixedElement(PassThruElement):
         return self.render(**kwargs)
 
     def render(self, **kwargs):
-        self.set_attrs(**kwargs)
-        return HTML.tag('div', self.value, **self.attributes)
+        return markup.tag('div', self._attr_html(**kwargs), self.value)
 
 
 form_elements['fixed'] = FixedElement
@@ -1247,9 +1629,8 @@ class StaticElement(ElementBase):
         return self.render(**kwargs)
 
     def render(self, **kwargs):
-        self.set_attrs(**kwargs)
-        displayval = self.displayval if self.displayval or self.displayval == 0 else None
-        return HTML.tag('span', displayval, **self.attributes)
+        displayval = display_value(self.displayval)
+        return markup.tag('span', self._attr_html(**kwargs), displayval)
 
 
 form_elements['static'] = StaticElement
@@ -1276,10 +1657,205 @@ class GroupElement(StaticElement, ElementRegistrar):
             if el.is_renderable:
                 yield el
 
+    def _bind(self, form):
+        el = StaticElement._bind(self, form)
+        el._formref = form
+        return el
+
+    def _bind_refs(self, bound):
+        elements = LazyOrderedDict()
+        for eid, el in self.elements.items():
+            elements[eid] = bound.get(id(el), el)
+        self.elements = self.els = elements
+
+    def render_fingerprint(self):
+        return StaticElement.render_fingerprint(self) + tuple(
+            el.render_fingerprint() for el in self.renderable_els
+        )
+
 
 form_elements['elgroup'] = GroupElement
 
 
+class RepeatElement(FormFieldElementBase):
+    """
+    A repeating subform (field array), e.g. the lines of an invoice.  The
+    fields of one row are added to `row`, a headless form:
+
+        lines = form.add_repeat('lines', 'Lines', max_rows=500)
+        lines.row.add_text('item', 'Item', required=True)
+        lines.row.add_text('qty', 'Quantity', 'int')
+
+    The submitted value is a list of dicts, one per row, as JSON APIs send
+    it.  HTML forms submit each row's fields as "<name>-<index>-<field id>",
+    e.g. "lines-0-qty", and the form collects them into rows.  Rows whose
+    fields are all empty are skipped.  Every row is validated with the same
+    row elements and processors and the value is a list of dicts of each
+    row's values.  Row errors are recorded with the row field's name (e.g.
+    "lines-3-qty") as their element id and by row index in `row_errors`.
+
+    Rows render as a table.  `extra_rows` empty rows are added at the end
+    from row_template(), which is cached and can also be used by scripts
+    that add rows.
+    """
+    _submit_missing = True
+
+    def __init__(self, form, eid, label=NotGiven, defaultval=NotGiven, min_rows=0,
+                 max_rows=None, extra_rows=1, **kwargs):
+        FormFieldElementBase.__init__(self, form, eid, label, defaultval=defaultval, **kwargs)
+        # import here or we get circular import problems
+        from blazeform.form import ApiForm
+        #: the form holding the fields of a row
+        self.row = ApiForm('%s-row' % eid)
+        self.min_rows = min_rows
+        self.max_rows = max_rows
+        self.extra_rows = extra_rows
+        #: the errors of the invalid rows by index, each a dict of lists of
+        #: FieldErrors by row field id (None for the row's own validators)
+        self.row_errors = {}
+        # the bound copy of `row` that submitted rows are validated with
+        self._row_form = None
+        # (key, html) of the empty row, see row_template()
+        self._row_template = None
+        self.add_attr('class', 'repeat')
+
+    def _bind(self, form):
+        el = FormFieldElementBase._bind(self, form)
+        el.row_errors = {}
+        el._row_form = None
+        return el
+
+    def render_fingerprint(self):
+        return FormFieldElementBase.render_fingerprint(self) + (
+            self.extra_rows,
+            tuple(el.render_fingerprint() for el in self.row.renderable_els),
+        )
+
+    def render_attrs(self, **kwargs):
+        """ no name attribute, the row fields have the names """
+        return HasValueElement.render_attrs(self, **kwargs)
+
+    def row_name(self, index, field=None):
+        " the name of row field `field` in row `index`, or of the row "
+        name = '%s-%s' % (self.nameattr or self.id, index)
+        if field is None:
+            return name
+        return '%s-%s' % (name, field)
+
+    def _missing_submittedval(self, values):
+        return self.rows_from(values)
+
+    def rows_from(self, values):
+        " collects this element's rows from the flat `values` of an HTML form "
+        prefix = '%s-' % (self.nameattr or self.id)
+        rows = {}
+        for key in values:
+            if not key.startswith(prefix):
+                continue
+            index, _, field = key[len(prefix):].partition('-')
+            if index.isdigit() and field:
+                rows.setdefault(int(index), {})[field] = values[key]
+        return [rows[index] for index in sorted(rows)]
+
+    def _bound_row(self):
+        if self._row_form is None:
+            self._row_form = self.row.bind()
+        self._row_form.catalog = self.form.catalog
+        return self._row_form
+
+    def _to_python_processing(self):
+        if self._valid is not None:
+            return
+
+        rows = self.submittedval
+        if is_empty(rows):
+            rows = []
+        # keep the submitted indexes, they are used in the errors' ids
+        rows = [(index, row) for index, row in enumerate(rows)
+                if not isinstance(row, dict) or not all(map(is_empty, row.values()))]
+        self.row_errors = {}
+        values = []
+        if self.required and not rows:
+            self.add_error(self._required_error())
+        elif len(rows) < self.min_rows:
+            self.add_error(self._error('tooFewRows', 'enter at least %(min)i rows',
+                                       {'min': self.min_rows}))
+        elif self.max_rows is not None and len(rows) > self.max_rows:
+            self.add_error(self._error('tooManyRows', 'enter no more than %(max)i rows',
+                                       {'max': self.max_rows}))
+        else:
+            row_form = self._bound_row()
+            for index, row in rows:
+                if not isinstance(row, dict):
+                    error = self._error('invalidRow', 'row %(index)i is not valid',
+                                        {'index': index})
+                    error.eid = self.row_name(index)
+                    self.row_errors[index] = {None: [error]}
+                    self.add_error(error)
+                elif row_form.validate(row):
+                    values.append(row_form.get_values())
+                else:
+                    errors = self.row_errors[index] = {}
+                    for error in row_form.iter_errors():
+                        errors.setdefault(error.eid, []).append(error)
+                        error.eid = self.row_name(index, error.eid)
+                        self.add_error(error)
+
+        self._valid = not self._errors
+        if self._valid:
+            self._safeval = values
+
+    def _render_row(self, row_form, index):
+        cells = []
+        for field in row_form.renderable_els:
+            attrs = {
+                'name': self.row_name(index, field.id),
+                'id': '%s-%s-%s' % (self.getidattr(), index, field.id),
+            }
+            if self.form._static and hasattr(field, 'render_static'):
+                cells.append(markup.HTML.td(field.render_static(**attrs)))
+            else:
+                cells.append(markup.HTML.td(field.render(**attrs)))
+        return markup.HTML.tr(*cells) + markup.HTML.NL
+
+    def row_template(self, index='__index__'):
+        """
+            The HTML of an empty row (with the row fields' defaults) for row
+            `index`.  It is rendered once with an "__index__" placeholder in
+            the names and ids and cached until the row's fields change.
+        """
+        key = (self.getidattr(), self.form._static,
+               tuple(el.render_fingerprint() for el in self.row.renderable_els))
+        cached = self._row_template
+        if cached is None or cached[0] != key:
+            cached = self._row_template = (key, self._render_row(self.row.bind(), '__index__'))
+        return cached[1].replace('__index__', six.text_type(index))
+
+    def render(self, **kwargs):
+        # a copy of the row form, so rendering doesn't change the element
+        row_form = self.row.bind()
+        rows = self.displayval
+        if is_empty(rows) or not is_iterable(rows):
+            rows = []
+        body = []
+        index = -1
+        for index, row in enumerate(rows):
+            if isinstance(row, dict):
+                row_form.set_submitted(row)
+                body.append(self._render_row(row_form, index))
+        if not self.form._static:
+            for index in range(index + 1, index + 1 + self.extra_rows):
+                body.append(self.row_template(index))
+        HTML = markup.HTML
+        head = HTML.tr(*[HTML.th(field.label.value if is_given(field.label.value) else '')
+                         for field in row_form.renderable_els])
+        return markup.tag('table', self._attr_html(**kwargs), HTML.NL,
+                          HTML.thead(head), HTML.NL, HTML.tbody(HTML.NL, *body), HTML.NL)
+
+
+form_elements['repeat'] = RepeatElement
+
+
 class HeaderElement(StaticElement):
     """
     A rendering element used for adding headers to a form.  It can also be used,
@@ -1293,10 +1869,12 @@ class HeaderElement(StaticElement):
         StaticElement.__init__(self, form, eid, label=NotGiven, defaultval=defaultval, **kwargs)
         self.level = level
 
+    def render_fingerprint(self):
+        return StaticElement.render_fingerprint(self) + (self.level,)
+
     def render(self, **kwargs):
-        self.set_attrs(**kwargs)
-        displayval = self.displayval if self.displayval or self.displayval == 0 else None
-        return HTML.tag(self.level, displayval, **self.attributes)
+        displayval = display_value(self.displayval)
+        return markup.tag(self.level, self._attr_html(**kwargs), displayval)
 
 
 form_elements['header'] = HeaderElement
@@ -1351,29 +1929,53 @@ class LogicalSupportElement(ElementBase):
     def __call__(self, **kwargs):
         return self.render(**kwargs)
 
+    def _bind_refs(self, bound):
+        self.lgroup = bound.get(id(self.lgroup), self.lgroup)
+
+    @property
+    def chosen(self):
+        return self._chosen
+
+    @chosen.setter
+    def chosen(self, chosen):
+        self._chosen = chosen
+        # the group keeps track of its chosen members
+        if chosen:
+            self.lgroup._chosen_keys.add(self._lgroup_key)
+        else:
+            self.lgroup._chosen_keys.discard(self._lgroup_key)
+
+    def render_fingerprint(self):
+        return ElementBase.render_fingerprint(self) + (
+            self.etype,
+            self.chosen,
+            self.lgroup.id,
+        )
+
+    def render_attrs(self, **kwargs):
+        attrs = ElementBase.render_attrs(self)
+        attrs['class'] = self.etype
+        self._cleankeys(kwargs)
+        attrs.update(kwargs)
+        return attrs
+
     def render(self, **kwargs):
-        self.set_attr('class_', self.etype)
         if self.form._static:
             return self.render_static(**kwargs)
         else:
             return self.render_html(**kwargs)
 
     def render_html(self, **kwargs):
-        if self.displayval or self.displayval == 0:
-            self.set_attr('value', self.displayval)
-        if self.chosen:
-            self.set_attr(self.chosen_attr, self.chosen_attr)
-        else:
-            try:
-                self.del_attr(self.chosen_attr)
-            except KeyError:
-                pass
-        self.set_attrs(**kwargs)
-        self.set_attr('name', self.lgroup.id)
-        return HTML.input(type=self.etype, **self.attributes)
-
-    def _static_attributes(self):
-        attrs = self.attributes.copy()
+        attrs = {self.chosen_attr: self.chosen_attr if self.chosen else None}
+        displayval = display_value(self.displayval)
+        if displayval is not None:
+            attrs['value'] = displayval
+        self._cleankeys(kwargs)
+        attrs.update(kwargs)
+        attrs['name'] = self.lgroup.id
+        return markup.tag('input', self._attr_html(), type=self.etype, **attrs)
+
+    def _build_static_attributes(self, attrs):
         for attr in ('checked', 'name', 'type', 'selected'):
             try:
                 del attrs[attr]
@@ -1389,15 +1991,11 @@ class LogicalSupportElement(ElementBase):
         return attrs
 
     def render_static(self, **kwargs):
-        self.set_attrs(**kwargs)
-        if self.chosen or self.get_attr(self.chosen_attr, None):
-            if self.displayval or self.displayval == 0:
-                todisplay = self.displayval
-            else:
-                todisplay = literal('&nbsp;')
+        if self.chosen or self.render_attrs(**kwargs).get(self.chosen_attr):
+            todisplay = display_value(self.displayval, markup.literal('&nbsp;'))
         else:
-            todisplay = literal('&nbsp;')
-        return HTML.span(todisplay, **self._static_attributes())
+            todisplay = markup.literal('&nbsp;')
+        return markup.tag('span', self._static_attr_html(**kwargs), todisplay)
 
 
 class MultiCheckboxElement(LogicalSupportElement):
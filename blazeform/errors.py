@@ -0,0 +1,158 @@
+"""
+    Structured validation errors.  Elements and forms keep FieldError records
+    for their errors, with a `code` for the kind of error, so errors can be
+    counted or mapped to API responses without looking at the messages.  A
+    record's message is only translated and formatted when it is asked for,
+    element `errors` and all_errors() still give the messages as strings.
+"""
+from __future__ import absolute_import
+
+import six
+
+
+@six.python_2_unicode_compatible
+class FieldError(object):
+    """
+        An error for the element with id `eid` (None for form level errors).
+        `code` is the kind of error: 'required' for required fields that were
+        left empty, the message key of the FormEncode validator that failed
+        (e.g. 'empty', 'tooLong', 'integer') for processor errors, or
+        'invalid' when nothing more specific is known.
+
+        The error's `message` is `template`, translated by `catalog` (a
+        blazeform.i18n.Catalog) if given and formatted with `params`, unless
+        the formatted `message` is given.  It is built the first time it is
+        used.  Errors compare equal to their message strings, two errors are
+        only equal if their element ids and codes are equal too.
+    """
+    __slots__ = ('eid', 'code', 'template', 'params', 'catalog', '_message')
+
+    def __init__(self, eid, code, template, params=None, message=None, catalog=None):
+        self.eid = eid
+        self.code = code
+        self.template = template
+        self.params = params
+        self.catalog = catalog
+        self._message = message
+
+    @property
+    def message(self):
+        # kept as built, it can be markup (e.g. a webhelpers literal)
+        if self._message is None:
+            message = self.template
+            if self.catalog is not None:
+                message = self.catalog.gettext(message)
+            if self.params is not None:
+                message = message % self.params
+            self._message = message
+        return self._message
+
+    def as_dict(self):
+        "the error's code and message, e.g. for a JSON response"
+        return {'code': self.code, 'message': six.text_type(self.message)}
+
+    def __str__(self):
+        return six.text_type(self.message)
+
+    def __html__(self):
+        # messages that are markup (e.g. a webhelpers literal) stay unescaped
+        from webhelpers2.html import escape
+        return escape(self.message)
+
+    def __eq__(self, other):
+        if isinstance(other, FieldError):
+            return (self.eid, self.code, self.message) == (other.eid, other.code, other.message)
+        if isinstance(other, six.string_types):
+            return self.message == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash(self.message)
+
+    def __reduce__(self):
+        # the catalog isn't pickled, so the message is formatted first
+        return (self.__class__, (self.eid, self.code, self.template, self.params, self.message))
+
+    def __repr__(self):
+        return '<FieldError %s %s: %r>' % (self.eid, self.code, self.message)
+
+
+class MessageTemplate(six.text_type):
+    """
+        A FormEncode message template handed to validators by elements
+        through FormEncode's `state._` translation hook, translated from
+        `source` when the form has a catalog.  Formatting it keeps the
+        template and parameters on the resulting message, so the error record
+        for it can be built with the validator's message key and parameters.
+    """
+
+    def __new__(cls, text, source=None):
+        template = six.text_type.__new__(cls, text)
+        template.source = text if source is None else source
+        return template
+
+    def __mod__(self, params):
+        return FormattedMessage(six.text_type.__mod__(self, params), self, params)
+
+
+class FormattedMessage(six.text_type):
+    " a message formatted from a MessageTemplate, see above "
+
+    def __new__(cls, text, template, params):
+        msg = six.text_type.__new__(cls, text)
+        msg.template = template
+        msg.params = params
+        return msg
+
+
+def default_gettext(template, **kwargs):
+    """
+        Translates `template` the way FormEncode does for validators whose
+        state has no translation hook: with builtins._ (e.g. installed by
+        gettext.install()) if there is one, otherwise with the function set
+        by formencode.api.set_stdtranslation().
+    """
+    from formencode import api
+    from six.moves import builtins
+    trans = getattr(builtins, '_', None)
+    if not callable(trans):
+        trans = api._stdtrans
+    return trans(template, **kwargs)
+
+
+def message_key(validator, template):
+    """
+        Returns the key `validator` (or one of the validators it wraps) uses
+        for the message `template`, or None.
+    """
+    for key, value in getattr(validator, '_messages', {}).items():
+        if value == template:
+            return key
+    wrapped = list(getattr(validator, 'validators', None) or ())
+    if getattr(validator, 'validator', None) is not None:
+        wrapped.append(validator.validator)
+    for sub in wrapped:
+        key = message_key(sub, template)
+        if key is not None:
+            return key
+    return None
+
+
+def processor_error(eid, processor, exc, msg=None, catalog=None):
+    """
+        The FieldError for formencode.Invalid `exc` raised by `processor`.
+        `msg` replaces the message, but the code is still found.
+    """
+    text = exc.msg
+    if isinstance(text, FormattedMessage):
+        source = text.template.source
+        code = message_key(processor, source) or 'invalid'
+        if msg:
+            return FieldError(eid, code, msg, catalog=catalog)
+        # already formatted (and translated) by the validator
+        return FieldError(eid, code, source, text.params, text, catalog)
+    return FieldError(eid, 'invalid', msg or six.text_type(exc), catalog=catalog)
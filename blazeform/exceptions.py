@@ -20,3 +20,24 @@ class ValueInvalid(Exception):
     """
     def __init__(self, desc=''):
         Exception.__init__(self, desc)
+
+
+class UploadRejected(Exception):
+    """ raised while a file upload is being streamed as soon as the upload
+        breaks one of its FileElement's rules, so that reading the rest of the
+        upload can be abandoned.  `translator` holds the partial upload and its
+        errors and can be given to the element as its submitted value.
+    """
+    def __init__(self, translator):
+        self.translator = translator
+        Exception.__init__(self, '; '.join(str(error) for error in translator.errors))
+
+
+class SubmissionRejected(Exception):
+    """ raised when submitted data breaks one of a form's submission limits,
+        before the data is given to the form's elements.  `error` is a
+        FieldError describing the limit that was broken.
+    """
+    def __init__(self, error):
+        self.error = error
+        Exception.__init__(self, str(error))
@@ -1,10 +1,74 @@
+from __future__ import absolute_import
+import hashlib
+import io
+import mimetypes
+import mmap
+import tempfile
+
+import six
+
+from blazeform.exceptions import UploadRejected
+
+# (offset, magic bytes, content type) used by sniff_content_type()
+magic_numbers = (
+    (0, b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (0, b'\xff\xd8\xff', 'image/jpeg'),
+    (0, b'GIF87a', 'image/gif'),
+    (0, b'GIF89a', 'image/gif'),
+    (8, b'WEBP', 'image/webp'),
+    (0, b'II*\x00', 'image/tiff'),
+    (0, b'MM\x00*', 'image/tiff'),
+    (0, b'BM', 'image/bmp'),
+    (0, b'%PDF-', 'application/pdf'),
+    (0, b'PK\x03\x04', 'application/zip'),
+    (0, b'\x1f\x8b', 'application/gzip'),
+    (0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/x-ole-storage'),
+    (0, b'MZ', 'application/x-msdownload'),
+    (0, b'\x7fELF', 'application/x-executable'),
+)
+#: how many bytes from the start of a file sniff_content_type() needs
+sniff_length = 16
+
+
+def sniff_content_type(head):
+    """
+        Returns the content type identified by the magic number at the start
+        of `head` (the first `sniff_length` bytes of a file), 'text/plain' if
+        it looks like UTF-8 text, or None if it can't be identified.
+    """
+    for offset, magic, content_type in magic_numbers:
+        if head.startswith(magic, offset):
+            return content_type
+    if b'\x00' in head:
+        return None
+    try:
+        head.decode('utf-8')
+    except UnicodeDecodeError:
+        # the head may have cut a multi-byte character short
+        try:
+            head[:-3].decode('utf-8')
+        except UnicodeDecodeError:
+            return None
+    return 'text/plain'
+
 
 class BaseTranslator(object):
+    """
+        Gives FileElement a uniform view of an uploaded file.  If the upload's
+        data is available, it can be read through read()/seek()/tell() or
+        `stream` (a file-like object), or all at once without copying through
+        buffer().  close() releases the buffer and the stream; translators are
+        also context managers that close themselves.
+    """
 
-    def __init__(self, file_name, content_type, content_length):
+    def __init__(self, file_name, content_type, content_length, stream=None):
         self.file_name = file_name
         self.content_type = content_type
         self.content_length = content_length
+        #: a file-like object holding the upload's data, if available
+        self.stream = stream
+        self._buffer = None
+        self._mmap = None
 
     @property
     def is_uploaded(self):
@@ -12,8 +76,341 @@ class BaseTranslator(object):
         # If its None, empty string, False, etc., the file was not uploaded.
         return bool(self.file_name)
 
+    def read(self, size=-1):
+        if self.stream is None:
+            return b''
+        return self.stream.read(size)
+
+    def seek(self, offset, whence=0):
+        if self.stream is not None:
+            self.stream.seek(offset, whence)
+
+    def tell(self):
+        if self.stream is None:
+            return 0
+        return self.stream.tell()
+
+    def buffer(self):
+        """
+            Returns a read-only memoryview of the whole upload.  Uploads that
+            are still in memory are viewed in place and uploads on disk are
+            memory-mapped, so neither gets copied.  Streams that support
+            neither are read into memory.  Call this once the upload is
+            complete; it stays valid until close().
+        """
+        if self._buffer is not None:
+            return self._buffer
+        stream = self.stream
+        # SpooledTemporaryFile keeps the data in _file, a BytesIO until it rolls over to disk
+        raw = getattr(stream, '_file', stream)
+        if stream is None:
+            self._buffer = memoryview(b'')
+        elif isinstance(raw, io.BytesIO) and hasattr(raw, 'getbuffer'):
+            self._buffer = raw.getbuffer()
+        else:
+            try:
+                raw.flush()
+                self._mmap = mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ)
+                self._buffer = memoryview(self._mmap)
+            except (AttributeError, IOError, OSError, ValueError, io.UnsupportedOperation):
+                # no real file (or an empty one, which can't be mapped)
+                stream.seek(0)
+                self._buffer = memoryview(stream.read())
+        return self._buffer
+
+    def close(self):
+        if self._buffer is not None:
+            if hasattr(self._buffer, 'release'):
+                self._buffer.release()
+            self._buffer = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self.stream is not None:
+            self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+
+def stream_length(stream):
+    "the number of bytes in a seekable `stream`, which is left at its start"
+    if stream is None:
+        return 0
+    stream.seek(0, 2)
+    length = stream.tell()
+    stream.seek(0)
+    return length
+
 
 class WerkzeugTranslator(BaseTranslator):
 
     def __init__(self, value):
-        BaseTranslator.__init__(self, value.filename, value.content_type, value.content_length)
+        BaseTranslator.__init__(self, value.filename, value.content_type, value.content_length,
+                                getattr(value, 'stream', None))
+
+    @classmethod
+    def accepts(cls, value):
+        return all(hasattr(value, attr) for attr in ('filename', 'content_type', 'content_length'))
+
+
+class StarletteTranslator(BaseTranslator):
+    """
+        For ASGI uploads like Starlette's UploadFile, which keep their data in
+        a (synchronous) file object as `file`.
+    """
+
+    def __init__(self, value):
+        size = getattr(value, 'size', None)
+        if size is None:
+            size = stream_length(value.file)
+        BaseTranslator.__init__(self, value.filename, value.content_type, size, value.file)
+
+    @classmethod
+    def accepts(cls, value):
+        return all(hasattr(value, attr) for attr in ('filename', 'content_type', 'file'))
+
+
+class FieldStorageTranslator(BaseTranslator):
+    "For cgi.FieldStorage uploads, which keep the content type as `type`"
+
+    def __init__(self, value):
+        BaseTranslator.__init__(self, value.filename, value.type, stream_length(value.file),
+                                value.file)
+
+    @classmethod
+    def accepts(cls, value):
+        return all(hasattr(value, attr) for attr in ('filename', 'type', 'file'))
+
+
+class DictTranslator(BaseTranslator):
+    """
+        For uploads parsed into a dict, like Tornado's or those from
+        multipart parsers: 'filename' and the data as 'body' (bytes) or
+        'file' (a file-like object), with 'content_type' (or 'type').
+    """
+
+    def __init__(self, value):
+        if 'body' in value:
+            stream = io.BytesIO(value['body'])
+            length = len(value['body'])
+        else:
+            stream = value['file']
+            length = stream_length(stream)
+        content_type = value.get('content_type', value.get('type'))
+        BaseTranslator.__init__(self, value['filename'], content_type, length, stream)
+
+    @classmethod
+    def accepts(cls, value):
+        return isinstance(value, dict) and 'filename' in value \
+            and ('body' in value or 'file' in value)
+
+
+class TupleTranslator(BaseTranslator):
+    """
+        For uploads given as a (filename, data) or (filename, data,
+        content_type) tuple, with the data as bytes or a file-like object.
+        Without a content type, it is guessed from the file name.
+    """
+
+    def __init__(self, value):
+        file_name, data = value[:2]
+        if isinstance(data, six.binary_type):
+            stream = io.BytesIO(data)
+            length = len(data)
+        else:
+            stream = data
+            length = stream_length(data)
+        if len(value) > 2:
+            content_type = value[2]
+        else:
+            content_type = mimetypes.guess_type(file_name or '')[0] or ''
+        BaseTranslator.__init__(self, file_name, content_type, length, stream)
+
+    @classmethod
+    def accepts(cls, value):
+        return isinstance(value, tuple) and len(value) in (2, 3)
+
+
+class TranslatorRegistry(object):
+    """
+        Picks the translator for a submitted upload: calling the registry
+        with the value returns it translated by the first registered
+        translator whose accepts() returns True for it.  The choice is cached
+        per type of value and only reconsidered when the cached translator no
+        longer accepts a value of that type.
+
+        A form's `_fu_translator` is the default registry, `translators`.
+        Register a translator on it for other kinds of uploads, or give a
+        form a registry (or a single translator class) of its own.
+    """
+
+    def __init__(self, *translators):
+        self.translators = list(translators)
+        self._by_type = {}
+
+    def register(self, translator, first=False):
+        """
+            add a translator class (with an accepts() classmethod), which is
+            tried after those already registered unless `first` is True
+        """
+        if first:
+            self.translators.insert(0, translator)
+        else:
+            self.translators.append(translator)
+        self._by_type.clear()
+
+    def translator_for(self, value):
+        translator = self._by_type.get(type(value))
+        if translator is not None and translator.accepts(value):
+            return translator
+        for translator in self.translators:
+            if translator.accepts(value):
+                self._by_type[type(value)] = translator
+                return translator
+        raise TypeError('no file upload translator accepts %r' % type(value))
+
+    def __call__(self, value):
+        return self.translator_for(value)(value)
+
+
+#: the default registry, used by forms unless they are given another
+translators = TranslatorRegistry(
+    WerkzeugTranslator,
+    StarletteTranslator,
+    FieldStorageTranslator,
+    DictTranslator,
+    TupleTranslator,
+)
+
+
+class StreamTranslator(BaseTranslator):
+    """
+        Receives an upload as it is read, one chunk at a time, through write().
+
+        If `element` (a FileElement) is given, the file name and content type
+        are checked against its rules right away and the size is checked as
+        each chunk arrives.  UploadRejected is raised as soon as a rule is
+        broken, so the rest of the upload never has to be read or stored.
+        Accepted data is written to `dest`, which becomes the `stream`.  By
+        default that is a temporary file kept in memory until the upload is
+        larger than `spool_size` bytes and then moved to disk.
+
+        The content type is also sniffed from the first bytes of the upload
+        (see `sniffed_type`) and, if the element asks for it, the type rules
+        are applied to it too.  If `hash_name` is given (or the element
+        sets one with hash_uploads()), a hash of the upload is computed as
+        it streams, see `hexdigest`.  Chunks are passed on to the hash and
+        `dest` as they are, without being copied.
+
+        This is also a file-like object, so it can be returned from a
+        Werkzeug stream_factory (see FileElement.stream_factory()).
+    """
+
+    #: uploads larger than this many bytes are spooled to disk
+    spool_size = 1024 * 1024
+
+    def __init__(self, file_name, content_type, element=None, dest=None, hash_name=None):
+        BaseTranslator.__init__(self, file_name, content_type, 0, dest)
+        self.element = element
+        #: the rules this upload broke
+        self.errors = []
+        #: the content type sniffed from the upload's first bytes, see sniff_content_type()
+        self.sniffed_type = None
+        self._head = b''
+        self._sniffed = False
+        if hash_name is None and element is not None:
+            hash_name = element._hash_name
+        self.hash_name = hash_name
+        self._hash = hashlib.new(hash_name) if hash_name else None
+        if element is not None and self.is_uploaded:
+            self.errors.extend(element._check_name(file_name))
+            self.errors.extend(element._check_type(content_type))
+
+    @property
+    def checked(self):
+        "were the element's rules applied while streaming?"
+        return self.element is not None
+
+    @property
+    def rejected(self):
+        return bool(self.errors)
+
+    def write(self, chunk):
+        self.check(chunk)
+        if self.stream is None:
+            self.stream = tempfile.SpooledTemporaryFile(self.spool_size)
+        self.stream.write(chunk)
+
+    def check(self, chunk):
+        """
+            apply the rules to the next chunk of the upload and hash it without
+            storing it, raising UploadRejected if a rule is broken
+        """
+        if self.errors:
+            raise UploadRejected(self)
+        self.content_length += len(chunk)
+        if self.element is not None:
+            self.errors.extend(self.element._check_size(self.content_length))
+            if self.errors:
+                raise UploadRejected(self)
+        if not self._sniffed:
+            self._head += bytes(chunk[:sniff_length - len(self._head)])
+            if len(self._head) >= sniff_length:
+                self._sniff()
+                if self.errors:
+                    raise UploadRejected(self)
+        if self._hash is not None:
+            self._hash.update(chunk)
+
+    def _sniff(self):
+        self._sniffed = True
+        self.sniffed_type = sniff_content_type(self._head)
+        self._head = None
+        if self.element is not None and self.element._verify_type:
+            self.errors.extend(self.element._check_sniffed_type(self.sniffed_type,
+                                                                self.content_type))
+
+    def finish(self):
+        """
+            called once the whole upload has been written, to sniff uploads
+            shorter than `sniff_length`
+        """
+        if not self._sniffed and self.content_length:
+            self._sniff()
+
+    @property
+    def digest(self):
+        if self._hash is None:
+            return None
+        return self._hash.digest()
+
+    @property
+    def hexdigest(self):
+        if self._hash is None:
+            return None
+        return self._hash.hexdigest()
+
+    def feed(self, chunks):
+        """
+            write each chunk from the iterable `chunks`, stopping (and leaving
+            the rest of `chunks` unread) if the upload is rejected.  Returns
+            True if the whole upload was accepted.
+        """
+        if self.errors:
+            return False
+        try:
+            for chunk in chunks:
+                self.write(chunk)
+        except UploadRejected:
+            return False
+        self.seek(0)
+        return not self.errors
+
+    def seek(self, offset, whence=0):
+        # Werkzeug seeks to the start once the upload has been written
+        self.finish()
+        BaseTranslator.seek(self, offset, whence)
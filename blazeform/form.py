@@ -1,20 +1,22 @@
 from __future__ import absolute_import
-import formencode
-import inspect
-from blazeutils.datastructures import LazyOrderedDict
 
-from blazeform.element import form_elements, CancelElement, CheckboxElement, \
-        MultiSelectElement, LogicalGroupElement
+from blazeform.element import form_elements, formencode, procs, CancelElement, FileElement, \
+    GroupElement
+from blazeform.errors import FieldError, MessageTemplate, default_gettext, processor_error
 from blazeform.exceptions import ElementInvalid, ProgrammingError
-from blazeform.file_upload_translators import WerkzeugTranslator
-from blazeform.processors import Wrapper
-from blazeform.util import HtmlAttributeHolder, NotGiven, ElementRegistrar, is_notgiven
-
-# fix the bug in the formencode MaxLength validator
-from formencode.validators import MaxLength
+from blazeform.file_upload_translators import translators
+from blazeform.parsing import content_type_params, parse_multipart, parse_urlencoded, \
+    SubmissionLimits
+from blazeform.util import HtmlAttributeHolder, NotGiven, ElementRegistrar, is_notgiven, \
+    SubmittedValues, tolist, next_version, LazyOrderedDict, LazyModule
 import six
-MaxLength._messages['__buggy_toolong'] = MaxLength._messages['tooLong']
-MaxLength._messages['tooLong'] = 'Enter a value not greater than %(maxLength)i characters long'
+
+# imported on first render, it imports this module too
+render = LazyModule('blazeform.render')
+
+
+def get_renderer(el):
+    return render.get_renderer(el)
 
 
 class FormBase(HtmlAttributeHolder, ElementRegistrar):
@@ -22,6 +24,27 @@ class FormBase(HtmlAttributeHolder, ElementRegistrar):
     Base class for forms.
     """
 
+    #: a blazeform.cache.RenderCache used when rendering static forms.  Usually
+    #: set on a form subclass so that all instances share it.
+    render_cache = None
+    #: a blazeform.i18n.Catalog for translating error messages
+    catalog = None
+    #: the number of fields set_submitted_raw() accepts in a body
+    max_fields = 1000
+    #: limits checked before submitted values are given to the elements (and
+    #: by set_submitted_raw() while parsing), see parsing.SubmissionLimits.
+    #: `max_lengths` is a dict mapping element types (e.g. 'text' or
+    #: 'textarea') to the maximum length of their values, which overrides
+    #: `max_value_length` for them.  None is no limit.
+    max_value_length = None
+    max_total_length = None
+    max_values = None
+    max_lengths = None
+    #: include a hidden field so we can check if this form was submitted?
+    submit_flag = True
+    #: headless forms are never rendered, so their elements skip HTML setup
+    headless = False
+
     def __init__(self, name, static=False, **kwargs):
         HtmlAttributeHolder.__init__(self, **kwargs)
         ElementRegistrar.__init__(self, self)
@@ -42,9 +65,14 @@ class FormBase(HtmlAttributeHolder, ElementRegistrar):
         # our validators
         self._validators = []
         # file upload translator
-        self._fu_translator = WerkzeugTranslator
+        self._fu_translator = translators
         # form errors
         self._errors = []
+        # changes when elements are added, see _submission_map()
+        self._els_version = next_version()
+        self._submission_map_cache = None
+        self._wanted_keys_cache = None
+        self._max_lengths_cache = None
         # exception handlers
         self._exception_handlers = []
         # is the form static?
@@ -52,7 +80,27 @@ class FormBase(HtmlAttributeHolder, ElementRegistrar):
 
         # init actions
         self.register_elements(form_elements)
-        self.add_hidden(self._form_ident_field, value='submitted')
+        if self.submit_flag:
+            self.add_hidden(self._form_ident_field, value='submitted')
+
+    @property
+    def _name(self):
+        return self._form_name
+
+    @_name.setter
+    def _name(self, value):
+        self._form_name = value
+        # elements cache their id attributes until this changes
+        self._idattr_version = next_version()
+
+    @property
+    def _element_id_formatter(self):
+        return self._id_formatter
+
+    @_element_id_formatter.setter
+    def _element_id_formatter(self, value):
+        self._id_formatter = value
+        self._idattr_version = next_version()
 
     @property
     def defaultable_els(self):
@@ -78,6 +126,45 @@ class FormBase(HtmlAttributeHolder, ElementRegistrar):
             if el.is_returning:
                 yield el
 
+    def only_els(self, els, only=None):
+        """
+            filter an element iterable down to the elements whose ids are
+            given in `only`.  If `only` is None, all elements are returned.
+        """
+        if only is None:
+            return els
+        only = set(tolist(only))
+        return (el for el in els if el.id in only)
+
+    def bind(self):
+        """
+            Returns a copy of this form for handling a single request.
+
+            The copy shares this form's configuration (element options,
+            processors, validators, etc.), which must be treated as read-only,
+            but has its own elements, attributes, submitted values, errors and
+            other per-request state.  That lets a form be built once and kept
+            as a schema that any number of threads can bind() and then submit,
+            validate and render concurrently, without locks or rebuilding the
+            form.  The schema itself should not be submitted to.
+        """
+        form = object.__new__(self.__class__)
+        form.__dict__.update(self.__dict__)
+        form.attributes = self.attributes
+        form._formref = form
+        form._errors = []
+        form._validators = list(self._validators)
+        form._exception_handlers = list(self._exception_handlers)
+        form._registered_types = dict(self._registered_types)
+        form.elements = LazyOrderedDict()
+        form.els = form.elements
+        bound = {}
+        for eid, el in self.elements.items():
+            bound[id(el)] = form.elements[eid] = el._bind(form)
+        for el in form.elements.values():
+            el._bind_refs(bound)
+        return form
+
     def register_elements(self, dic):
         for type, eclass in dic.items():
             self.register_element_type(type, eclass)
@@ -105,7 +192,16 @@ class FormBase(HtmlAttributeHolder, ElementRegistrar):
             return True
         return False
 
-    def add_error(self, msg):
+    def _(self, template, **kwargs):
+        " FormEncode's translation hook for form validators, see FormFieldElementBase._() "
+        if self.catalog is None:
+            return MessageTemplate(default_gettext(template, **kwargs), template)
+        return MessageTemplate(self.catalog.gettext(template), template)
+
+    def add_error(self, msg, code='invalid'):
+        "adds a form level error, `msg` is a FieldError or a message that gets `code`"
+        if not isinstance(msg, FieldError):
+            msg = FieldError(None, code, msg, catalog=self.catalog)
         self._errors.append(msg)
 
     def is_cancel(self):
@@ -135,13 +231,13 @@ class FormBase(HtmlAttributeHolder, ElementRegistrar):
         """
         if not formencode.is_validator(validator):
             if callable(validator):
-                validator = Wrapper(to_python=validator)
+                validator = procs.Wrapper(to_python=validator)
             else:
                 raise TypeError('validator must be a Formencode validator or a callable')
         else:
             # FE validators may be passed as the class or an instance
             #   if class, then make it an instance
-            if inspect.isclass(validator):
+            if isinstance(validator, six.class_types):
                 validator = validator()
 
         self._validators.append((validator, msg))
@@ -151,10 +247,10 @@ class FormBase(HtmlAttributeHolder, ElementRegistrar):
         for el in self.elements.keys():
             if el in errors.keys():
                 if isinstance(errors[el], str):
-                    getattr(self.elements, el).errors.append(errors[el])
+                    getattr(self.elements, el).add_error(errors[el])
                 elif isinstance(errors[el], list):
                     for error in errors[el]:
-                        getattr(self.elements, el).errors.append(error)
+                        getattr(self.elements, el).add_error(error)
                 else:
                     raise TypeError('add_field_errors must be passed a dictionary with '
                                     'values of either strings, or lists of strings')
@@ -164,25 +260,33 @@ class FormBase(HtmlAttributeHolder, ElementRegistrar):
             return False
         return True
 
-    def is_valid(self):
+    def is_valid(self, only=None):
+        """
+            If `only` is given, it should be a list of element ids and only
+            those elements will be validated.  Form level validators usually
+            need the whole form and are therefore skipped in that case.
+        """
         if not self.is_submitted():
             return False
         valid = True
 
         # element validation
-        for element in self.submittable_els:
+        for element in self.only_els(self.submittable_els, only):
             if not element.is_valid():
                 valid = False
 
+        if only is not None:
+            return valid
+
         # whole form validation
         for validator, msg in self._validators:
             try:
-                validator.to_python(self)
+                validator.to_python(self, self)
             except formencode.Invalid as e:
                 valid = False
-                msg = (msg or str(e))
-                if msg:
-                    self.add_error(msg)
+                error = processor_error(None, validator, e, msg, self.catalog)
+                if error.message:
+                    self.add_error(error)
             except ElementInvalid as e:
                 # since we are getting an ElementInvalid exception, that means
                 # our validator needed the value of an element to complete
@@ -193,42 +297,176 @@ class FormBase(HtmlAttributeHolder, ElementRegistrar):
 
         return valid
 
-    def _set_submitted_values(self, values):
-        for el in self.submittable_els:
-                key = el.nameattr or el.id
-                if key in values:
-                    el.submittedval = values[key]
-                elif isinstance(el, (CheckboxElement, MultiSelectElement, LogicalGroupElement)):
-                    el.submittedval = None
+    def _elements_changed(self):
+        self._els_version = next_version()
+
+    def _submission_map(self):
+        """
+            A (key, element id, multiple, fills missing) tuple for each
+            submittable element: the key its value is submitted under, if it
+            takes all the values submitted for the key and if it sets a value
+            when the key is missing (see FormFieldElementBase._submit_missing).
+            It is built once for each set of elements and shared with bound
+            copies of the form.
+        """
+        state = (self._els_version, len(self.els))
+        cached = self._submission_map_cache
+        if cached is None or cached[0] != state:
+            submission_map = tuple(
+                (el.nameattr or el.id, el.id, bool(getattr(el, 'multiple', False)),
+                 el._submit_missing)
+                for el in self.submittable_els
+            )
+            cached = self._submission_map_cache = (state, submission_map)
+        return cached[1]
+
+    def _wanted_keys(self):
+        """
+            returns a function that tells if a submitted key is used by one of
+            the form's elements, for set_submitted_raw()
+        """
+        submission_map = self._submission_map()
+        cached = self._wanted_keys_cache
+        if cached is None or cached[0] is not submission_map:
+            keys = frozenset(entry[0] for entry in submission_map)
+            # elements that collect prefixed keys, i.e. RepeatElement
+            prefixes = tuple('%s-' % key for key, eid, multiple, fills in submission_map
+                             if hasattr(self.els[eid], 'rows_from'))
+
+            def wanted(key):
+                return key in keys or (prefixes and key.startswith(prefixes))
+            cached = self._wanted_keys_cache = (submission_map, wanted)
+        return cached[1]
+
+    def _max_key_length(self):
+        " the length of the longest key the form's elements use, for set_submitted_raw() "
+        lengths = [0]
+        for key, eid, multiple, fills in self._submission_map():
+            el = self.els[eid]
+            if hasattr(el, 'rows_from'):
+                # "<key>-<row index>-<row key>", any 64 bit row index
+                lengths.append(len(key) + 22 + el.row._max_key_length())
+            else:
+                lengths.append(len(key))
+        return max(lengths)
+
+    def set_submitted_raw(self, body, content_type, charset='utf-8'):
+        """
+            Parses the raw request `body` (bytes), sent with `content_type`,
+            straight into the form's submitted values.
+            application/x-www-form-urlencoded and multipart/form-data bodies
+            are supported.  The values of keys the form does not use are
+            skipped without decoding them, as are urlencoded keys too long to
+            be one it uses, and `max_fields` and `max_value_length` are
+            checked while parsing: SubmissionRejected is raised when the body
+            breaks one of them.
+        """
+        mime_type, params = content_type_params(content_type)
+        wanted = self._wanted_keys()
+        if mime_type == 'application/x-www-form-urlencoded':
+            pairs = parse_urlencoded(body, wanted, self.max_fields, self.max_value_length,
+                                     charset, self._max_key_length())
+        elif mime_type == 'multipart/form-data' and params.get('boundary'):
+            pairs = parse_multipart(body, params['boundary'], wanted, self.max_fields,
+                                    self.max_value_length, charset)
+        else:
+            raise ValueError('unsupported content type "%s"' % content_type)
+        self.set_submitted(SubmittedValues(pairs))
+
+    def _max_lengths(self):
+        """
+            the maximum value length for each element id, from `max_lengths`
+            and `max_value_length`, cached until they or the elements change
+        """
+        submission_map = self._submission_map()
+        by_type = self.max_lengths or {}
+        state = (submission_map, self.max_value_length, sorted(by_type.items()))
+        cached = self._max_lengths_cache
+        if cached is None or cached[0] != state:
+            types = dict((eclass, type) for type, eclass in self._registered_types.items())
+            max_lengths = {}
+            for key, eid, multiple, fills in submission_map:
+                max_length = by_type.get(types.get(self.els[eid].__class__),
+                                         self.max_value_length)
+                if max_length is not None:
+                    max_lengths[eid] = max_length
+            cached = self._max_lengths_cache = (state, max_lengths)
+        return cached[1]
+
+    def _submission_limits(self):
+        " a SubmissionLimits for a submission, or None if the form has no limits "
+        max_lengths = self._max_lengths()
+        if not max_lengths and self.max_total_length is None and self.max_values is None:
+            return None
+        return SubmissionLimits(max_lengths, self.max_total_length, self.max_values)
+
+    def _submitted_values(self, values):
+        """
+            the (element, value) pairs for submitted `values`, all checked
+            against the form's limits before any of them is given to its
+            element, so a rejected submission leaves the form as it was
+        """
+        els = self.els
+        getlist = getattr(values, 'getlist', None)
+        limits = self._submission_limits()
+        pairs = []
+        for key, eid, multiple, fills_missing in self._submission_map():
+            if key in values:
+                if multiple and getlist is not None:
+                    value = getlist(key)
+                else:
+                    value = values[key]
+            elif fills_missing:
+                value = els[eid]._missing_submittedval(values)
+            else:
+                continue
+            # uploads are (file name, data, content type) tuples or
+            # translators, their sizes are up to the element's maxsize()
+            if limits is not None and not isinstance(els[eid], FileElement):
+                limits.check(eid, value)
+            pairs.append((els[eid], value))
+        return pairs
 
     def set_submitted(self, values):
-        """ values should be dict like """
+        """
+            `values` is a dict, a multidict (anything with getlist(), like
+            Werkzeug's MultiDict), whose fields that take multiple values get
+            all the values submitted for them, or a list of (key, value) pairs
+            like urllib's parse_qsl() returns.
+
+            SubmissionRejected is raised if the values break one of the
+            form's limits (`max_value_length`, `max_lengths`,
+            `max_total_length` and `max_values`).
+        """
 
         # if the form is static, it shoudl not get submitted values
         if self._static:
             raise ProgrammingError('static forms should not get submitted values')
 
-        self._errors = []
+        if not hasattr(values, 'keys'):
+            values = SubmittedValues(values)
 
-        # ident field first since we need to know that to now if we need to
-        # apply the submitted values
+        # the ident field tells us if we need to apply the submitted values.
+        # It is one of them, so it is only set once they all pass the limits.
         identel = getattr(self.elements, self._form_ident_field)
         ident_key = identel.nameattr or identel.id
-        if ident_key in values:
-            identel.submittedval = values[ident_key]
+        pairs = ()
+        if ident_key in values or self._is_submitted():
+            pairs = self._submitted_values(values)
 
-        if self._is_submitted():
-            self._set_submitted_values(values)
+        self._errors = []
+        for el, value in pairs:
+            el.submittedval = value
 
     def set_defaults(self, values):
         for el in self.defaultable_els:
             if el.id in values:
                 el.defaultval = values[el.id]
 
-    def get_values(self):
-        "return a dictionary of element values"
+    def get_values(self, only=None):
+        "return a dictionary of element values, limited to the ids in `only` if given"
         retval = {}
-        for element in self.returning_els:
+        for element in self.only_els(self.returning_els, only):
             try:
                 key = element.nameattr or element.id
             except AttributeError:
@@ -274,14 +512,15 @@ class FormBase(HtmlAttributeHolder, ElementRegistrar):
     def all_errors(self, id_as_key=False):
         """
             Returns a tuple with two elements.  First element is a list of all
-            the form-level error strings.  The second is a dict where (by
-            default) the keys are field label strings and the value is a list
-            of that fields's error strings.
+            the form-level errors.  The second is a dict where (by default)
+            the keys are field label strings and the value is a list of that
+            fields's error strings.  iter_errors() gives the errors as
+            FieldError records.
 
             If you set id_as_key=True, the dict of field errors will use the
             field's id, instead of it's label, as the key of the dict.
         """
-        form_errors = list(self._errors)
+        form_errors = [error.message for error in self._errors]
         field_errors = {}
         for el in self.submittable_els:
             for msg in el.errors:
@@ -294,11 +533,23 @@ class FormBase(HtmlAttributeHolder, ElementRegistrar):
                 field_errors[key].append(msg)
         return form_errors, field_errors
 
+    def iter_errors(self):
+        """
+            Yields the form level errors and then the errors of each field as
+            FieldError records.  Their messages are only formatted when used,
+            so this is cheap when only the error codes are needed.
+        """
+        for error in self._errors:
+            yield error
+        for el in self.submittable_els:
+            for error in el.iter_errors():
+                yield error
+
 
 class Form(FormBase):
     """
-    Main form class using default HTML renderer and Werkzeug file upload
-    translator
+    Main form class using default HTML renderer and the default file upload
+    translators
     """
     def __init__(self, name, static=False, **kwargs):
         # make the form's name the id
@@ -306,7 +557,63 @@ class Form(FormBase):
             kwargs['id'] = name
 
         FormBase.__init__(self, name, static, **kwargs)
-
-        # import here or we get circular import problems
-        from blazeform.render import get_renderer
         self._renderer = get_renderer
+
+
+class ApiForm(FormBase):
+    """
+    A form for JSON APIs.  It has no submit flag field and no renderer:
+    validate() takes the request's (JSON decoded) data and error_dict()
+    returns the errors keyed by element id, each with a code and a message.
+
+    Values for the elements of an element group can be given as a nested
+    dict under the group's id, and multi-value fields take lists.
+    """
+    submit_flag = False
+    headless = True
+
+    def __init__(self, name='api', **kwargs):
+        FormBase.__init__(self, name, **kwargs)
+        self._submitted = False
+
+    def _is_submitted(self):
+        return self._submitted
+
+    def set_submitted(self, values):
+        pairs = self._submitted_values(self._flatten(values, self.els))
+        self._errors = []
+        self._submitted = True
+        for el in self.submittable_els:
+            el._clear_submitted()
+        for el, value in pairs:
+            el.submittedval = value
+
+    def _flatten(self, values, els):
+        flat = dict(values)
+        for el in els.values():
+            if isinstance(el, GroupElement) and isinstance(values.get(el.id), dict):
+                flat.update(self._flatten(values[el.id], el.els))
+        return flat
+
+    def validate(self, values, only=None):
+        """
+            set `values` as the submitted values, replacing those of any
+            earlier call, and return True if they are valid
+        """
+        self.set_submitted(values)
+        return self.is_valid(only)
+
+    def error_dict(self):
+        """
+            Returns a dict with the form level errors as 'form' and a dict of
+            field errors keyed by element id as 'fields'.  Each error is a
+            dict with a 'code' and a 'message'.
+        """
+        form_errors = []
+        fields = {}
+        for error in self.iter_errors():
+            if error.eid is None:
+                form_errors.append(error.as_dict())
+            else:
+                fields.setdefault(error.eid, []).append(error.as_dict())
+        return {'form': form_errors, 'fields': fields}
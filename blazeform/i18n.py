@@ -0,0 +1,63 @@
+"""
+    Message catalogs for translating error messages.  Give a form a catalog
+    and the errors of its elements and validators are translated when their
+    messages are formatted:
+
+        form = MyForm('person').bind()
+        form.catalog = get_catalog('de', localedir='/path/to/app/locale')
+
+    Catalogs are keyed by message template (the English message with its
+    %(param)s placeholders), like gettext msgids.
+"""
+from __future__ import absolute_import
+import gettext
+import threading
+
+from formencode.api import get_localedir
+
+from blazeform.cache import LRUCache
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+class Catalog(object):
+    """
+        Translates message templates.  `translations` is a gettext
+        translations object or a dict of templates to translated templates.
+        Lookups are cached, so each template is only looked up once.
+    """
+
+    def __init__(self, translations, cache_size=2000):
+        if isinstance(translations, dict):
+            self._lookup = lambda template: translations.get(template, template)
+        else:
+            self._lookup = getattr(translations, 'ugettext', translations.gettext)
+        self._cache = LRUCache(cache_size)
+
+    def gettext(self, template):
+        text = self._cache.get(template)
+        if text is None:
+            text = self._lookup(template)
+            self._cache[template] = text
+        return text
+
+
+def get_catalog(locale, domain='blazeform', localedir=None):
+    """
+        Returns the Catalog for `locale`.  It is loaded from compiled gettext
+        (.mo) catalogs the first time and cached after that: `domain` in
+        `localedir` for blazeform's and the application's messages, falling
+        back to FormEncode's own catalog for its validators' messages.
+    """
+    key = (locale, domain, localedir)
+    catalog = _catalogs.get(key)
+    if catalog is None:
+        with _catalogs_lock:
+            catalog = _catalogs.get(key)
+            if catalog is None:
+                translations = gettext.translation(domain, localedir, [locale], fallback=True)
+                translations.add_fallback(gettext.translation(
+                    'FormEncode', get_localedir(), [locale], fallback=True))
+                catalog = _catalogs[key] = Catalog(translations)
+    return catalog
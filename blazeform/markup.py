@@ -0,0 +1,53 @@
+from __future__ import absolute_import
+
+from webhelpers2.html import HTML, escape, literal, tags  # noqa
+
+attr_fmt = literal(' {0}="{1}"')
+empty = literal('')
+
+# select options, see SelectElement._options_html()
+option_html = literal('<option value="%s">%s</option>\n')
+option_start_len = len('<option')
+selected_option_start = literal('<option selected="selected"')
+
+
+def attr_name(key):
+    "the HTML attribute name webhelpers uses for keyword argument `key`"
+    return key.rstrip('_').replace('_', '-')
+
+
+def attr_html(attrs):
+    """
+        Escapes the attributes in `attrs` the way webhelpers' HTML.tag() does
+        (dropping None values, joining class lists, handling boolean
+        attributes, etc.) and returns a dict mapping each attribute name to
+        its escaped ' name="value"' fragment.  Elements keep these for their
+        attributes so that rendering only has to escape values that change.
+    """
+    attrs = dict(attrs)
+    HTML.optimize_attrs(attrs)
+    return dict((key, attr_fmt.format(key, value)) for key, value in attrs.items())
+
+
+def tag(tag_name, attrs_html, *content, **attrs):
+    """
+        Like webhelpers' HTML.tag(), and producing identical markup, but with
+        the attributes already escaped into `attrs_html` (from attr_html()).
+        Keyword arguments are escaped and take precedence over `attrs_html`;
+        a value of None removes the attribute.  `_closed=False` leaves the tag
+        open.
+    """
+    closed = attrs.pop('_closed', True)
+    if attrs:
+        attrs_html = dict(attrs_html)
+        for key in attrs:
+            attrs_html.pop(attr_name(key), None)
+        attrs_html.update(attr_html(attrs))
+    attrs_str = empty.join([attrs_html[key] for key in sorted(attrs_html)])
+    if not content and tag_name in HTML.void_tags and closed:
+        return literal('<{0}{1} />').format(tag_name, attrs_str)
+    chunks = [literal('<{0}{1}>').format(tag_name, attrs_str)]
+    chunks.extend(content)
+    if closed:
+        chunks.append(literal('</{0}>').format(tag_name))
+    return HTML(*chunks)
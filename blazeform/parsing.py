@@ -0,0 +1,177 @@
+"""
+    Parsers for raw request bodies, see FormBase.set_submitted_raw().  They
+    only decode the values of the fields a form asks for, other values (and
+    keys too long to be one the form uses) are skipped without being copied
+    or decoded.  Also the limits forms put on the values they are given, see
+    SubmissionLimits.
+"""
+from __future__ import absolute_import
+import re
+
+import six
+from six.moves.urllib.parse import unquote_plus
+
+from blazeform.errors import FieldError
+from blazeform.exceptions import SubmissionRejected
+
+_param_re = re.compile(r';\s*([\w-]+)="?([^";]*)"?')
+
+
+def content_type_params(content_type):
+    " returns the mime type and a dict of the parameters of a Content-Type header "
+    mime_type = content_type.split(';', 1)[0].strip().lower()
+    return mime_type, dict((key.lower(), value) for key, value in
+                           _param_re.findall(content_type))
+
+
+def _unquote(raw, charset):
+    if six.PY2:
+        return unquote_plus(raw).decode(charset, 'replace')
+    return unquote_plus(raw.decode('latin-1'), encoding=charset, errors='replace')
+
+
+def _too_many(max_fields):
+    return SubmissionRejected(FieldError(None, 'tooManyFields',
+                                         'more than %(max)i fields submitted',
+                                         {'max': max_fields}))
+
+
+def _too_long(key, max_length):
+    return SubmissionRejected(FieldError(key, 'valueTooLong',
+                                         'value longer than %(max)i characters submitted',
+                                         {'max': max_length}))
+
+
+class SubmissionLimits(object):
+    """
+        Checks submitted values against a form's limits as they are given to
+        its elements and raises SubmissionRejected as soon as one is broken:
+
+        * `max_lengths`: the maximum length of each string value by element
+          id (the elements without one are not checked)
+        * `max_total_length`: of all the string values together
+        * `max_values`: the number of values in a list, like those of
+          multi-value fields, and of fields in a dict
+
+        Lists and dicts (JSON data, repeating subform rows) are checked
+        recursively.  A SubmissionLimits is only used for one submission.
+    """
+
+    def __init__(self, max_lengths, max_total_length=None, max_values=None):
+        self.max_lengths = max_lengths
+        self.max_total_length = max_total_length
+        self.max_values = max_values
+        self.total_length = 0
+
+    def check(self, eid, value):
+        if isinstance(value, six.string_types):
+            length = len(value)
+            max_length = self.max_lengths.get(eid)
+            if max_length is not None and length > max_length:
+                raise _too_long(eid, max_length)
+            if self.max_total_length is not None:
+                self.total_length += length
+                if self.total_length > self.max_total_length:
+                    raise SubmissionRejected(FieldError(
+                        eid, 'tooLarge', 'more than %(max)i characters submitted',
+                        {'max': self.max_total_length}))
+        elif isinstance(value, (list, tuple, dict)):
+            if self.max_values is not None and len(value) > self.max_values:
+                raise SubmissionRejected(FieldError(
+                    eid, 'tooManyValues', 'more than %(max)i values submitted',
+                    {'max': self.max_values}))
+            for item in (value.values() if isinstance(value, dict) else value):
+                self.check(eid, item)
+
+
+def parse_urlencoded(body, wanted, max_fields=None, max_value_length=None, charset='utf-8',
+                     max_key_length=None):
+    """
+        Returns the (key, value) pairs of the application/x-www-form-urlencoded
+        `body` whose keys `wanted(key)` returns True for.  SubmissionRejected
+        is raised as soon as there are more than `max_fields` fields (wanted
+        or not) or a wanted value is longer than `max_value_length`.  Keys
+        too long to decode to a wanted key of at most `max_key_length`
+        characters are skipped without decoding them.
+    """
+    max_raw_key = None if max_key_length is None else max_key_length * 12
+    pairs = []
+    count = 0
+    pos = 0
+    length = len(body)
+    while pos < length:
+        end = body.find(b'&', pos)
+        if end == -1:
+            end = length
+        if end > pos:
+            count += 1
+            if max_fields is not None and count > max_fields:
+                raise _too_many(max_fields)
+            eq = body.find(b'=', pos, end)
+            if eq == -1:
+                eq = end
+            # a character is at most 4 bytes of UTF-8, each encoded as "%XX",
+            # so longer keys and values can be turned down before decoding
+            key = None
+            if max_raw_key is None or eq - pos <= max_raw_key:
+                key = _unquote(body[pos:eq], charset)
+            if key is not None and wanted(key):
+                if max_value_length is not None and end - eq - 1 > max_value_length * 12:
+                    raise _too_long(key, max_value_length)
+                value = _unquote(body[eq + 1:end], charset)
+                if max_value_length is not None and len(value) > max_value_length:
+                    raise _too_long(key, max_value_length)
+                pairs.append((key, value))
+        pos = end + 1
+    return pairs
+
+
+def parse_multipart(body, boundary, wanted, max_fields=None, max_value_length=None,
+                    charset='utf-8'):
+    """
+        Like parse_urlencoded() for a multipart/form-data `body`.  Uploaded
+        files are returned as (file name, data, content type) tuples, which
+        the file upload translators accept, and `max_value_length` only
+        applies to the other fields.
+    """
+    if isinstance(boundary, six.text_type):
+        boundary = boundary.encode('latin-1')
+    delimiter = b'--' + boundary
+    view = memoryview(body)
+    pairs = []
+    count = 0
+    pos = body.find(delimiter)
+    while pos != -1:
+        pos += len(delimiter)
+        if body[pos:pos + 2] != b'\r\n':
+            # the closing delimiter, or a malformed body
+            break
+        headers_end = body.find(b'\r\n\r\n', pos)
+        if headers_end == -1:
+            break
+        data_end = body.find(b'\r\n' + delimiter, headers_end + 4)
+        if data_end == -1:
+            break
+        count += 1
+        if max_fields is not None and count > max_fields:
+            raise _too_many(max_fields)
+        headers = {}
+        for line in body[pos + 2:headers_end].split(b'\r\n'):
+            name, _, value = line.partition(b':')
+            headers[name.strip().lower()] = value.strip().decode(charset, 'replace')
+        _, params = content_type_params(headers.get(b'content-disposition', ''))
+        key = params.get('name')
+        if key is not None and wanted(key):
+            data = view[headers_end + 4:data_end]
+            if 'filename' in params:
+                pairs.append((key, (params['filename'], data.tobytes(),
+                                    headers.get(b'content-type'))))
+            else:
+                if max_value_length is not None and len(data) > max_value_length * 4:
+                    raise _too_long(key, max_value_length)
+                value = data.tobytes().decode(charset, 'replace')
+                if max_value_length is not None and len(value) > max_value_length:
+                    raise _too_long(key, max_value_length)
+                pairs.append((key, value))
+        pos = data_end + 2
+    return pairs
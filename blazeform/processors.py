@@ -2,12 +2,18 @@ from __future__ import absolute_import
 import decimal
 
 from formencode import Invalid
-from formencode.validators import FancyValidator
+from formencode.validators import FancyValidator, MaxLength
 
 from blazeform.exceptions import ValueInvalid
-from blazeform.util import tolist, is_iterable, is_notgiven
+from blazeform.util import tolist, is_iterable, is_notgiven, NotGiven
 import six
 
+# fix the bug in the formencode MaxLength validator.  Elements import this
+# module when they first validate, so this is done before any MaxLength runs
+# but not just for importing blazeform.
+MaxLength._messages['__buggy_toolong'] = MaxLength._messages['tooLong']
+MaxLength._messages['tooLong'] = 'Enter a value not greater than %(maxLength)i characters long'
+
 
 class BaseValidator(FancyValidator):
     def __classinit__(cls, new_attrs):
@@ -37,38 +43,85 @@ class Select(BaseValidator):
         'invalid': "the value chosen is invalid",
         }
 
+    # (list lengths, compiled sets), see _compiled()
+    _compiled_cache = None
+    _compiled_from = ('options', 'invalid', 'as_empty')
+
+    def __setattr__(self, name, value):
+        if name in self._compiled_from:
+            self.__dict__['_compiled_cache'] = None
+        BaseValidator.__setattr__(self, name, value)
+
+    def _lengths(self):
+        return (len(getattr(self, 'options', ())), len(tolist(self.invalid)),
+                len(tolist(self.as_empty)))
+
+    def _compiled(self):
+        """
+            The options, invalid and as_empty values as sets of text, so each
+            submitted value costs a set lookup.  They are built once and
+            rebuilt when one of the lists is replaced or items are added to
+            or removed from it; to change an item in place, replace the list.
+        """
+        cached = self._compiled_cache
+        lengths = self._lengths()
+        if cached is None or cached[0] != lengths:
+            options = getattr(self, 'options', ())
+            compiled = (
+                frozenset(six.text_type(d[0] if isinstance(d, tuple) else d) for d in options),
+                frozenset(six.text_type(d) for d in tolist(self.invalid)),
+                frozenset(six.text_type(d) for d in tolist(self.as_empty)),
+            )
+            cached = self._compiled_cache = (lengths, compiled)
+        return cached[1]
+
     def _to_python(self, value, state):
+        as_empty = self._compiled()[2]
         valiter = tolist(value)
-        as_empty = [six.text_type(d) for d in tolist(self.as_empty)]
-        vallist = [six.text_type(d) for d in valiter]
         # single
-        if len(vallist) == 1:
-            if vallist[0] in as_empty:
+        if len(valiter) == 1:
+            if as_empty and six.text_type(valiter[0]) in as_empty:
                 return None
             return value
         # multiple
-        to_remove = []
-        for index, val in enumerate(vallist):
-            if val in as_empty:
-                to_remove.append(index)
-        adjust = 0
-        for index in to_remove:
-            del valiter[index-adjust]
-            adjust += 1
-        return valiter
+        if not as_empty:
+            return list(valiter)
+        return [val for val in valiter if six.text_type(val) not in as_empty]
 
     def validate_other(self, values, state):
-        soptions = set([six.text_type(d[0] if isinstance(d, tuple) else d) for d in self.options])
-        sinvalid = set([six.text_type(d) for d in tolist(self.invalid)])
+        soptions, sinvalid, _ = self._compiled()
         svalues = set([six.text_type(d) for d in tolist(values)])
 
-        if len(sinvalid.intersection(svalues)) != 0:
+        if sinvalid and not sinvalid.isdisjoint(svalues):
             raise Invalid(self.message('invalid', state), values, state)
 
-        if len(soptions.intersection(svalues)) != len(svalues):
+        if not svalues.issubset(soptions):
             raise Invalid(self.message('notthere', state), values, state)
 
-        return
+
+class GroupMembers(Select):
+    """
+    Like Select, but for LogicalGroupElement: the value(s) must be those of
+    the group's members.  The group being validated (the state) keeps an
+    index of its members, so validation only depends on how many values were
+    submitted, not on how many members the group has.
+    """
+
+    allow_notgiven = False
+    __unpackargs__ = ('invalid', 'allow_notgiven')
+
+    def validate_other(self, values, state):
+        sinvalid = self._compiled()[1]
+        svalues = set([six.text_type(d) for d in tolist(values)])
+
+        if sinvalid and not sinvalid.isdisjoint(svalues):
+            raise Invalid(self.message('invalid', state), values, state)
+
+        index = state._member_index
+        for value in svalues:
+            # NotGiven(Iter) is '' as text
+            if value not in index and not (self.allow_notgiven and value == ''):
+                raise Invalid(self.message('notthere', state), values, state)
 
 
 class Confirm(BaseValidator):
@@ -86,7 +139,13 @@ class Confirm(BaseValidator):
         return False
 
     def validate_python(self, value, state):
-        if self.tomatch.is_valid() and self.tomatch.value != value:
+        # state is the element being validated.  If its form was bound from a
+        # shared form, match against the bound copy of our element.
+        tomatch = self.tomatch
+        form = getattr(state, 'form', None)
+        if form is not None and form is not tomatch.form:
+            tomatch = form.els.get(tomatch.id, tomatch)
+        if tomatch.is_valid() and tomatch.value != value:
             raise Invalid(
                 self.message('notequal', state, field=str(self.tomatch.label)), value, state
             )
@@ -108,8 +167,8 @@ class MultiValues(BaseValidator):
         """ need this so our confirm element can function correctly """
         if isinstance(self.validator, FancyValidator):
             return self.validator.is_empty(value)
-        # None and '' are "empty"
-        return value is None or value == '' or (
+        # None and '' (which NotGiven equals) are "empty"
+        return value is None or value is NotGiven or value == '' or (
             isinstance(value, (list, tuple, dict)) and not value)
 
     def _to_python(self, value, state):
@@ -2,8 +2,9 @@ from __future__ import absolute_import
 from webhelpers2.html import tags, HTML
 
 from blazeform import element
+from blazeform.cache import fingerprint
 from blazeform.form import FormBase
-from blazeform.util import StringIndentHelper, NotGiven, HtmlAttributeHolder
+from blazeform.util import StringIndentHelper, NotGiven, HtmlAttributeHolder, tolist
 
 
 class FormRenderer(object):
@@ -14,22 +15,28 @@ class FormRenderer(object):
         self.settings = {}
 
     def begin(self):
-        attr = self.element.get_attrs()
+        attr = self.element.render_attrs()
         action = attr.pop('action', '')
         self.output.inc(tags.form(action, **attr))
 
-    def render(self, **kwargs):
+    def render(self, only=None, section=None, **kwargs):
+        """
+            `only` limits rendering to a list of element ids and `section`
+            limits rendering to a header element and the elements that follow
+            it up to the next header.  The form tag and the form's submit flag
+            are always rendered so partial output can still be submitted.
+        """
         self.settings.update(kwargs)
         self.begin()
         on_first = True
         on_alt = False
         self.req_note_written = False
-        for child in self.rendering_els():
+        for child in self.partial_els(self.rendering_els(), only, section):
             if isinstance(child, element.HeaderElement):
                 if self.header_section_open:
                     self.output.dec('</div>')
                 on_first = True
-                hstr = '<div id="%s-section" class="header-section">' % child.getidattr()
+                hstr = '<div id="%s" class="header-section">' % child.getidattr('section')
                 self.output.inc(hstr)
                 self.header_section_open = True
                 if self.required_note_level == 'section':
@@ -38,7 +45,7 @@ class FormRenderer(object):
             r = rcls(child, self.output, on_first, on_alt, 'row', self.settings)
             if (r.uses_first and on_first) or isinstance(child, element.HeaderElement):
                 self.render_required_note(isinstance(child, element.HeaderElement))
-            r.render()
+            self.render_child(r)
             if r.uses_alt:
                 on_alt = not on_alt
             if r.uses_first:
@@ -72,10 +79,33 @@ class FormRenderer(object):
             self.output(req_note % {'above_header': above_header_class})
             self.req_note_written = True
 
+    def render_child(self, renderer):
+        renderer.render()
+
     def rendering_els(self):
         for el in self.element.renderable_els:
             yield el
 
+    def partial_els(self, els, only, section):
+        if only is None and section is None:
+            for el in els:
+                yield el
+            return
+        ident_id = self.element._form_ident_field
+        only = set(tolist(only)) if only is not None else None
+        in_section = False
+        for el in els:
+            if el.id == ident_id:
+                yield el
+                continue
+            if section is not None:
+                if isinstance(el, element.HeaderElement):
+                    in_section = el.id == section
+                if not in_section:
+                    continue
+            if only is None or el.id in only:
+                yield el
+
     def end(self):
         if self.header_section_open:
             self.output.dec('</div>')
@@ -95,6 +125,62 @@ class StaticFormRenderer(FormRenderer):
         element.ConfirmElement
     )
 
+    def __init__(self, element):
+        FormRenderer.__init__(self, element)
+        self.cache = element.render_cache
+        self.settings_key = None
+        self.fingerprints = {}
+
+    def render(self, only=None, section=None, **kwargs):
+        """
+            Static output only changes when the elements do, so if the form
+            has a render cache, use it for the whole form and for each row.
+        """
+        if self.cache is None:
+            return FormRenderer.render(self, only, section, **kwargs)
+        self.settings_key = fingerprint(dict(self.settings, **kwargs))
+        el_fingerprints = []
+        for el in self.partial_els(self.rendering_els(), only, section):
+            self.fingerprints[el.id] = el.render_fingerprint()
+            el_fingerprints.append(self.fingerprints[el.id])
+        key = self.cache.key(
+            'form',
+            self.element.__class__.__name__,
+            self.element._name,
+            fingerprint(self.element.attributes),
+            self.settings_key,
+            tuple(el_fingerprints),
+        )
+        retval = self.cache.get(key)
+        if retval is None:
+            retval = FormRenderer.render(self, only, section, **kwargs)
+            self.cache.set(key, retval)
+        return retval
+
+    def render_child(self, renderer):
+        if self.cache is None or not self.cache.fragments:
+            return FormRenderer.render_child(self, renderer)
+        el = renderer.element
+        el_fingerprint = self.fingerprints.get(el.id) or el.render_fingerprint()
+        # rows are cached as their output lines, which include indentation
+        key = self.cache.key(
+            'row',
+            renderer.__class__.__name__,
+            renderer.wrap_type,
+            renderer.is_first,
+            renderer.is_alt,
+            self.output.level,
+            self.settings_key,
+            el_fingerprint,
+        )
+        lines = self.cache.get(key)
+        if lines is None:
+            start = len(self.output.output)
+            renderer.render()
+            self.cache.set(key, self.output.output[start:])
+        else:
+            self.output.output.extend(lines)
+
     def begin(self):
         attrs = HtmlAttributeHolder(**self.element.attributes)
         attrs.add_attr('class', 'static-form')
@@ -176,8 +262,8 @@ class FieldRenderer(Renderer):
 
     def begin_row(self):
         self.output.inc(
-            '<div id="%s-%s" class="%s%s%s">' %
-            (self.element.getidattr(), self.wrap_type, self.wrap_type,
+            '<div id="%s" class="%s%s%s">' %
+            (self.element.getidattr(self.wrap_type), self.wrap_type,
              self.alt_class(), self.first_class())
         )
 
@@ -194,13 +280,12 @@ class FieldRenderer(Renderer):
 
     def label(self):
         if self.element.label.value:
-            if not self.element.label_after:
-                self.element.label.value += ':'
-            self.output(self.element.label())
+            suffix = '' if self.element.label_after else ':'
+            self.output(self.element.label(suffix=suffix))
 
     def field_wrapper(self):
-        self.output.inc('<div id="%s-fw" class="field-wrapper%s">' %
-                        (self.element.getidattr(), self.label_class))
+        self.output.inc('<div id="%s" class="field-wrapper%s">' %
+                        (self.element.getidattr('fw'), self.label_class))
 
     def required(self):
         if self.element.required and not self.element.form._static:
@@ -222,14 +307,15 @@ class FieldRenderer(Renderer):
             self.output.dec('</ul>')
 
     def errors(self):
-        if len(self.element.errors) == 1:
+        errors = self.element.errors
+        if len(errors) == 1:
             self.output('<p class="error">%s%s</p>' % (
                 self.setting('error_prefix'),
-                self.element.errors[0]
+                errors[0]
             ))
-        elif len(self.element.errors) > 1:
+        elif len(errors) > 1:
             self.output.inc('<ul class="errors">')
-            for msg in self.element.errors:
+            for msg in errors:
                 self.output('<li>%s%s</li>' % (
                     self.setting('error_prefix'),
                     msg
@@ -250,8 +336,8 @@ class FieldRenderer(Renderer):
 class InputRenderer(FieldRenderer):
     def begin_row(self):
         self.output.inc(
-            '<div id="%s-%s" class="%s %s%s%s">' %
-            (self.element.getidattr(), self.wrap_type, self.element.etype,
+            '<div id="%s" class="%s %s%s%s">' %
+            (self.element.getidattr(self.wrap_type), self.element.etype,
              self.wrap_type, self.alt_class(), self.first_class())
         )
 
@@ -267,17 +353,19 @@ class StaticRenderer(FieldRenderer):
 class GroupRenderer(StaticRenderer):
 
     def begin_row(self):
-        self.element.set_attr('id', '%s-%s' % (self.element.getidattr(), self.wrap_type))
+        attrs = self.element.render_attrs(id=self.element.getidattr(self.wrap_type))
         class_str = '%s%s%s' % (self.wrap_type, self.alt_class(), self.first_class())
-        self.element.add_attr('class', class_str)
+        if 'class' in attrs:
+            attrs['class'] = attrs['class'] + ' ' + class_str
+        else:
+            attrs['class'] = class_str
         # HTML.tag should not close the div
-        attrs = self.element.get_attrs()
         attrs['_closed'] = False
         self.output.inc(HTML.tag('div', **attrs))
 
     def field_wrapper(self):
-        self.output.inc('<div id="%s-fw" class="group-wrapper%s">' %
-                        (self.element.getidattr(), self.label_class))
+        self.output.inc('<div id="%s" class="group-wrapper%s">' %
+                        (self.element.getidattr('fw'), self.label_class))
 
     def render(self):
         self.begin()
@@ -303,6 +391,7 @@ def get_renderer(el):
         element.HiddenElement,
     )
     field = (
+        element.RepeatElement,
         element.SelectElement,
         element.TextAreaElement,
     )
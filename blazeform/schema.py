@@ -0,0 +1,267 @@
+"""
+    Build forms from JSON Schema documents and describe forms as JSON Schema.
+
+    Other metadata, like database table definitions, can be used by
+    converting it to a JSON Schema "object" document first:
+
+        form = form_from_schema({
+            'type': 'object',
+            'properties': {
+                'name': {'type': 'string', 'title': 'Name', 'maxLength': 50},
+                'age': {'type': 'integer', 'minimum': 0},
+                'color': {'enum': ['red', 'blue']},
+            },
+            'required': ['name'],
+        }, 'person')
+"""
+from __future__ import absolute_import
+import hashlib
+import json
+
+import formencode.validators as fev
+
+from blazeform.cache import LRUCache
+from blazeform.element import ButtonElement, CheckboxElement, ConfirmElement, DateElement, \
+    EmailElement, FileElement, FormFieldElementBase, ImageElement, LogicalGroupElement, \
+    PasswordElement, RepeatElement, ResetElement, SelectElement, SubmitElement, TimeElement, \
+    URLElement
+from blazeform.form import Form
+from blazeform.processors import Decimal
+from blazeform.util import is_given
+import six
+
+#: compiled forms by schema, see form_from_schema()
+schema_forms = LRUCache(100)
+
+# JSON Schema string formats and the element types used for them
+format_types = {
+    'email': 'email',
+    'uri': 'url',
+    'date': 'date',
+    'time': 'time',
+    'password': 'password',
+    'binary': 'file',
+}
+# the reverse, checked in order so subclasses come before their bases
+element_formats = (
+    (EmailElement, 'email'),
+    (URLElement, 'uri'),
+    (DateElement, 'date'),
+    (TimeElement, 'time'),
+    (PasswordElement, 'password'),
+    (FileElement, 'binary'),
+)
+# elements that only submit the form
+button_types = (ButtonElement, ImageElement, ResetElement, SubmitElement)
+json_types = six.string_types + six.integer_types + (float, bool, list, type(None))
+
+
+def schema_key(schema, name, form_class):
+    data = json.dumps(schema, sort_keys=True, default=six.text_type)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest(), name, form_class
+
+
+def form_from_schema(schema, name, form_class=Form, cache=schema_forms):
+    """
+        Returns a form with an element for each of the properties of the JSON
+        Schema "object" document `schema`.  The form is only built the first
+        time a schema is seen: it is cached by a hash of the schema, and each
+        call returns a copy of the cached form made with bind(), so the copies
+        can be used independently.  Pass `cache=None` to always build a new
+        form.
+    """
+    if cache is None:
+        return build_form(schema, name, form_class)
+    key = schema_key(schema, name, form_class)
+    form = cache.get(key)
+    if form is None:
+        form = build_form(schema, name, form_class)
+        cache[key] = form
+    return form.bind()
+
+
+def build_form(schema, name, form_class=Form):
+    " builds the form for form_from_schema() without caching it "
+    if schema.get('type', 'object') != 'object':
+        raise ValueError('schema should describe an object, got "%s"' % schema.get('type'))
+    form = form_class(name)
+    add_properties(form, schema)
+    return form
+
+
+def add_properties(form, schema):
+    " adds elements for the properties of object schema `schema` to `form` "
+    required = set(schema.get('required', ()))
+    specs = []
+    extras = []
+    for key, prop in schema.get('properties', {}).items():
+        spec, processors = element_spec(key, prop, key in required)
+        specs.append(spec)
+        extras.append((processors, prop))
+    for el, (processors, prop) in zip(form.add_elements(specs), extras):
+        for processor in processors:
+            el.add_processor(processor)
+        if prop.get('description'):
+            el.add_note(prop['description'])
+        if isinstance(el, RepeatElement):
+            add_properties(el.row, prop['items'])
+
+
+def element_spec(key, prop, required=False):
+    """
+        Returns an add_elements() spec and a list of processors for the
+        element for property `key`, described by the JSON Schema `prop`
+    """
+    spec = {'eid': key, 'label': prop.get('title', key), 'required': required}
+    if 'default' in prop:
+        spec['defaultval'] = prop['default']
+    processors = []
+    ptype = prop.get('type')
+
+    if ptype == 'array':
+        items = prop.get('items', {})
+        if items.get('type') == 'object':
+            spec.update(type='repeat', min_rows=prop.get('minItems', 0),
+                        max_rows=prop.get('maxItems'))
+        elif 'enum' in items:
+            spec.update(type='mselect', options=[(v, v) for v in items['enum']], choose=None)
+        else:
+            raise ValueError('unsupported array property "%s", only arrays of enums and '
+                             'objects are' % key)
+    elif 'enum' in prop:
+        spec.update(type='select', options=[(v, v) for v in prop['enum']])
+        if ptype == 'integer':
+            spec['vtype'] = 'int'
+    elif ptype == 'boolean':
+        spec['type'] = 'checkbox'
+    elif ptype == 'integer':
+        spec.update(type='text', vtype='int')
+        if 'minimum' in prop or 'maximum' in prop:
+            processors.append(fev.Int(min=prop.get('minimum'), max=prop.get('maximum')))
+    elif ptype == 'number':
+        spec['type'] = 'text'
+        processors.append(Decimal())
+        if 'minimum' in prop or 'maximum' in prop:
+            processors.append(fev.RangeValidator(min=prop.get('minimum'),
+                                                 max=prop.get('maximum')))
+    elif ptype in ('string', None):
+        spec['type'] = format_types.get(prop.get('format'), 'text')
+        if 'maxLength' in prop and spec['type'] != 'file':
+            spec['maxlength'] = prop['maxLength']
+        if 'minLength' in prop:
+            processors.append(fev.MinLength(prop['minLength']))
+        if 'pattern' in prop:
+            processors.append(fev.Regex(prop['pattern']))
+    else:
+        raise ValueError('unsupported type "%s" for property "%s"' % (ptype, key))
+    return spec, processors
+
+
+def to_json_schema(form):
+    """
+        Returns a JSON Schema "object" document describing the values the
+        form's fields accept.  Buttons, confirmation fields and the form's
+        submit flag are left out.
+    """
+    properties = {}
+    required = []
+    for el in form.els.values():
+        if not isinstance(el, FormFieldElementBase) or isinstance(el, button_types) \
+                or isinstance(el, ConfirmElement) or el.id == form._form_ident_field:
+            continue
+        properties[el.id] = element_schema(el)
+        if el.required:
+            required.append(el.id)
+    schema = {'type': 'object', 'properties': properties}
+    if required:
+        schema['required'] = required
+    return schema
+
+
+def _repeat_schema(el, prop):
+    prop.update(type='array', items=to_json_schema(el.row))
+    if el.min_rows:
+        prop['minItems'] = el.min_rows
+    if el.max_rows is not None:
+        prop['maxItems'] = el.max_rows
+
+
+def _enum_schema(el, prop, values):
+    if el.multiple:
+        prop.update(type='array', items={'enum': values})
+    else:
+        prop['enum'] = values
+
+
+def _select_schema(el, prop):
+    choose = [opt[0] for opt in el.choose or ()]
+    values = [opt[0] if isinstance(opt, (list, tuple)) else opt for opt in el.options]
+    _enum_schema(el, prop, [value for value in values if value not in choose])
+
+
+def _group_schema(el, prop):
+    _enum_schema(el, prop, [member.displayval for member in el.members.values()])
+
+
+def _checkbox_schema(el, prop):
+    prop['type'] = 'boolean'
+
+
+def _processor_constraints(processor, prop):
+    " adds the JSON Schema keywords for formencode `processor` to `prop` "
+    if isinstance(processor, fev.Int):
+        prop['type'] = 'integer'
+    elif isinstance(processor, (Decimal, fev.Number)):
+        prop['type'] = 'number'
+    if isinstance(processor, fev.RangeValidator):
+        if processor.min is not None:
+            prop['minimum'] = processor.min
+        if processor.max is not None:
+            prop['maximum'] = processor.max
+    elif isinstance(processor, fev.MaxLength):
+        prop['maxLength'] = processor.maxLength
+    elif isinstance(processor, fev.MinLength):
+        prop['minLength'] = processor.minLength
+    elif isinstance(processor, fev.Regex):
+        prop['pattern'] = getattr(processor.regex, 'pattern', processor.regex)
+
+
+def _text_schema(el, prop):
+    prop['type'] = 'string'
+    if el.vtype in ('integer', 'int'):
+        prop['type'] = 'integer'
+    elif el.vtype in ('number', 'num', 'float', 'decimal'):
+        prop['type'] = 'number'
+    elif el.vtype in ('boolean', 'bool'):
+        prop['type'] = 'boolean'
+    for processor, msg in el.processors:
+        _processor_constraints(processor, prop)
+    if prop['type'] == 'string':
+        for eclass, format in element_formats:
+            if isinstance(el, eclass):
+                prop['format'] = format
+                break
+
+
+# the first class `el` is an instance of decides how its schema is built
+element_schemas = (
+    (RepeatElement, _repeat_schema),
+    (SelectElement, _select_schema),
+    (LogicalGroupElement, _group_schema),
+    (CheckboxElement, _checkbox_schema),
+    (FormFieldElementBase, _text_schema),
+)
+
+
+def element_schema(el):
+    " the JSON Schema for the values of field element `el` "
+    prop = {}
+    if is_given(el.label.value):
+        prop['title'] = el.label.value
+    if is_given(el.defaultval) and isinstance(el.defaultval, json_types):
+        prop['default'] = el.defaultval
+    for eclass, build in element_schemas:
+        if isinstance(el, eclass):
+            build(el, prop)
+            break
+    return prop
@@ -1,6 +1,18 @@
 from __future__ import absolute_import
+from collections import OrderedDict
+import importlib
+import itertools
+
 import six
 
+# versions are unique across all objects so a cached value can never match a
+# different object that happens to be on the same version number
+_versions = itertools.count(1)
+
+
+def next_version():
+    return next(_versions)
+
 
 class StringIndentHelper(object):
 
@@ -40,8 +52,10 @@ def is_empty(value):
     #   * None
     #   * NotGiven/NotGivenIter
     #   * sequence with length 0 (includes empty string)
-    if value is None or is_notgiven(value):
+    if value is None or value is NotGiven or value is NotGivenIter:
         return True
+    if value.__class__ in _sized_types:
+        return not value
     try:
         return len(value) == 0
     except TypeError:
@@ -49,6 +63,23 @@ def is_empty(value):
     return False
 
 
+def display_value(value, default=None):
+    """
+        Returns `value` if it should be rendered, otherwise `default`.  Empty
+        values aren't, except for 0 and False.
+    """
+    if value is None or value is NotGiven or value is NotGivenIter:
+        return default
+    if value or value == 0:
+        return value
+    return default
+
+
+def is_blank(value):
+    " True for the values static renders show as a blank: NotGiven and '' "
+    return value is NotGiven or value == ''
+
+
 def multi_pop(d, *args):
     retval = {}
     for key in args:
@@ -72,19 +103,21 @@ class NotGivenBase(object):
     def __bool__(self):
         return False
 
+    # '' == u'' on Python 2 too, so one comparison covers both
     def __ne__(self, other):
-        if other == '' or other == u'' or other is None or isinstance(other, NotGivenBase):
-            return False
-        return True
+        return not (other == '' or other is None or isinstance(other, NotGivenBase))
 
     def __eq__(self, other):
-        if other == '' or other == u'' or other is None or isinstance(other, NotGivenBase):
-            return True
-        return False
+        return other == '' or other is None or isinstance(other, NotGivenBase)
 
     def __hash__(self):
         return hash(self.__class__)
 
+    def __reduce__(self):
+        # copies and unpickled values are the sentinel itself, so it can be
+        # checked for with `is`
+        return 'NotGiven'
+
 
 NotGiven = NotGivenBase()
 
@@ -100,14 +133,13 @@ class NotGivenIterBase(NotGivenBase):
         return False
 
     def __ne__(self, other):
-        if other == [] or isinstance(other, NotGivenBase):
-            return False
-        return True
+        return not (other == [] or isinstance(other, NotGivenBase))
 
     def __eq__(self, other):
-        if other == [] or isinstance(other, NotGivenBase):
-            return True
-        return False
+        return other == [] or isinstance(other, NotGivenBase)
+
+    def __reduce__(self):
+        return 'NotGivenIter'
 
     # we also want to emulate an empty list
     def __iter__(self):
@@ -125,6 +157,9 @@ class NotGivenIterBase(NotGivenBase):
 
 NotGivenIter = NotGivenIterBase()
 
+# types is_empty() can check with their truth value
+_sized_types = frozenset((str, six.text_type, bytes, list, tuple, dict))
+
 
 def tolist(x, default=[]):
     if x is None:
@@ -147,11 +182,79 @@ def is_iterable(possible_iterable):
 
 
 def is_notgiven(object):
-    return isinstance(object, NotGivenBase)
+    return object is NotGiven or object is NotGivenIter
 
 
 def is_given(object):
-    return not isinstance(object, NotGivenBase)
+    return object is not NotGiven and object is not NotGivenIter
+
+
+class SubmittedValues(dict):
+    """
+        Submitted values from (key, value) pairs, e.g. the output of
+        urllib's parse_qsl().  Like Werkzeug's MultiDict, it maps each key to
+        the first value given for it and getlist() returns all of them.
+    """
+
+    def __init__(self, pairs):
+        dict.__init__(self)
+        self._lists = {}
+        for key, value in pairs:
+            if key in self._lists:
+                self._lists[key].append(value)
+            else:
+                self._lists[key] = [value]
+                dict.__setitem__(self, key, value)
+
+    def getlist(self, key):
+        return list(self._lists.get(key, ()))
+
+
+class LazyModule(object):
+    """
+        Stands in for a module that is only imported when one of its
+        attributes is first used, so importing blazeform doesn't import
+        formencode or webhelpers until validating or rendering needs them.
+        Attributes are kept once looked up.
+    """
+
+    def __init__(self, name):
+        self.__dict__['_lazy_name'] = name
+
+    def __getattr__(self, attr):
+        value = getattr(importlib.import_module(self._lazy_name), attr)
+        self.__dict__[attr] = value
+        return value
+
+    def __repr__(self):
+        return '<LazyModule %s>' % self._lazy_name
+
+
+class LazyOrderedDict(OrderedDict):
+    """
+        An OrderedDict whose items can also be read as attributes, like
+        blazeutils' LazyOrderedDict (which imports all of blazeutils with it).
+        Attributes set after __init__ become items.
+    """
+
+    def __init__(self, ____sequence=None, **kwargs):
+        OrderedDict.__init__(self, ____sequence or (), **kwargs)
+        self.__dict__['_lod_initialized'] = True
+
+    def __getattr__(self, attr):
+        try:
+            return self[attr]
+        except KeyError:
+            raise AttributeError(
+                "'%s' object has no attribute '%s'" % (self.__class__.__name__, attr))
+
+    def __setattr__(self, item, value):
+        # attributes OrderedDict itself sets (on Python 2) and existing
+        # attributes are set normally
+        if not self.__dict__.get('_lod_initialized') or item in self.__dict__:
+            self.__dict__[item] = value
+        else:
+            self[item] = value
 
 
 class ElementRegistrar(object):
@@ -194,8 +297,114 @@ class ElementRegistrar(object):
             el.renders_in_group = True
             self.els[eid] = el
         self._formref.els[eid] = el
+        self._formref._elements_changed()
         return el
 
+    def add_elements(self, specs):
+        """
+            Create many elements at once, returning them in a list.  Each spec
+            is either a dict with the element's 'type' and 'eid' and its other
+            arguments as keyword arguments:
+
+                {'type': 'text', 'eid': 'name', 'label': 'Name', 'required': True}
+
+            or a tuple of the type, eid and positional arguments, optionally
+            followed by a dict of keyword arguments:
+
+                ('select', 'color', [(1, 'red'), (2, 'blue')], 'Color', {'required': True})
+
+            All elements are created before any is added to the form, so a bad
+            spec leaves the form unchanged.
+        """
+        form = self._formref
+        registered = form._registered_types
+        eclasses = {}
+        parsed = []
+        eids = set()
+        for spec in specs:
+            if isinstance(spec, dict):
+                kwargs = dict(spec)
+                try:
+                    type = kwargs.pop('type')
+                    eid = kwargs.pop('eid')
+                except KeyError:
+                    raise ValueError('element spec needs a type and eid: %r' % (spec,))
+                args = ()
+            elif isinstance(spec, (tuple, list)) and len(spec) >= 2:
+                type, eid = spec[:2]
+                args = spec[2:]
+                if args and isinstance(args[-1], dict):
+                    kwargs = args[-1]
+                    args = args[:-1]
+                else:
+                    kwargs = {}
+            else:
+                raise ValueError('invalid element spec: %r' % (spec,))
+            if eid in eids or eid in form.els:
+                raise ValueError('element id "%s" already used' % eid)
+            eids.add(eid)
+            if type not in eclasses:
+                try:
+                    eclasses[type] = registered[type]
+                except KeyError:
+                    raise ValueError('"%s" is not a registered element type' % type)
+            parsed.append((eclasses[type], eid, args, kwargs))
+
+        # construct them all before registering any, an element that fails
+        # to construct shouldn't leave the ones before it on the form
+        els = [eclass(form, eid, *args, **kwargs) for eclass, eid, args, kwargs in parsed]
+        if 'file' in eclasses:
+            form.set_attr('enctype', 'multipart/form-data')
+        for el in els:
+            if self._is_group:
+                el.renders_in_group = True
+                self.els[el.id] = el
+            form.els[el.id] = el
+        form._elements_changed()
+        return els
+
+
+class AttributeDict(dict):
+    """
+        A dict that gets a new `version` every time it is changed, so values
+        computed from it can be cached until it changes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self.version = next_version()
+
+    def _changed(self):
+        self.version = next_version()
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._changed()
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self._changed()
+
+    def setdefault(self, key, default=None):
+        self._changed()
+        return dict.setdefault(self, key, default)
+
+    def pop(self, *args):
+        self._changed()
+        return dict.pop(self, *args)
+
+    def popitem(self):
+        self._changed()
+        return dict.popitem(self)
+
+    def clear(self):
+        dict.clear(self)
+        self._changed()
+
 
 class HtmlAttributeHolder(object):
     def __init__(self, **kwargs):
@@ -203,6 +412,14 @@ class HtmlAttributeHolder(object):
         #: a dictionary that represents html attributes
         self.attributes = kwargs
 
+    @property
+    def attributes(self):
+        return self._attributes
+
+    @attributes.setter
+    def attributes(self, value):
+        self._attributes = AttributeDict(value)
+
     def set_attrs(self, **kwargs):
         self._cleankeys(kwargs)
         self.attributes.update(kwargs)
@@ -232,6 +449,17 @@ class HtmlAttributeHolder(object):
     def get_attrs(self):
         return self.attributes
 
+    def render_attrs(self, **kwargs):
+        """
+            Returns a copy of the attributes updated with `kwargs`.  Rendering
+            uses this instead of set_attrs() so that rendering never changes
+            the object and can be repeated or done concurrently.
+        """
+        self._cleankeys(kwargs)
+        attrs = dict(self.attributes)
+        attrs.update(kwargs)
+        return attrs
+
     def get_attr(self, key, defaultval=NotGiven):
         try:
             if key.endswith('_'):
@@ -249,7 +477,7 @@ class HtmlAttributeHolder(object):
             in with an underscore at the end (i.e. "class_").  We want to
             remove the underscore before saving
         """
-        for key, val in dict.items():
+        for key, val in list(dict.items()):
             if key.endswith('_'):
                 del dict[key]
                 dict[key[:-1]] = val
@@ -0,0 +1,96 @@
+"""
+    Timings for blazeform's hot paths, kept out of the test suite so that
+    the tests don't depend on how fast the machine running them is:
+
+        python scripts/benchmarks.py [name ...]
+
+    Without names, all benchmarks are run.  Each prints the best of several
+    runs.
+"""
+from __future__ import absolute_import, print_function
+import subprocess
+import sys
+import timeit
+
+from blazeform.form import ApiForm, Form
+
+
+def best(func, number, repeat=5):
+    " the best time of `repeat` runs of `func`, per call, in microseconds "
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+
+
+def build(form_class):
+    form = form_class('f')
+    for i in range(20):
+        form.add_text('text%d' % i, 'Text %d' % i, required=(i % 2 == 0), maxlength=50)
+    form.add_select('choice', [(i, 'option %d' % i) for i in range(20)], 'Choice')
+    form.add_checkbox('active', 'Active')
+    return form
+
+
+def construction():
+    " building a 22 field form, the HTML Form against the headless ApiForm "
+    form_time = best(lambda: build(Form), 200)
+    api_time = best(lambda: build(ApiForm), 200)
+    print('Form:    %8.1f us' % form_time)
+    print('ApiForm: %8.1f us (%.0f%% of Form)' % (api_time, api_time / form_time * 100))
+
+
+def fields():
+    " validating and statically rendering 200 text fields, a mix of missing, empty and set "
+    form = Form('f')
+    values = {'f-submit-flag': 'submitted'}
+    for i in range(200):
+        form.add_text('text%d' % i, 'Text %d' % i, required=(i % 2 == 0), maxlength=50)
+        if i % 4 == 1:
+            values['text%d' % i] = ''
+        elif i % 4 > 1:
+            values['text%d' % i] = 'value %d' % i
+
+    els = [el for el in form.els.values() if el.id != 'f-submit-flag']
+
+    def validate():
+        form.set_submitted(values)
+        form.is_valid()
+
+    def render():
+        for el in els:
+            el.render_static()
+    validate()
+    print('set_submitted + is_valid: %8.2f us per field' % (best(validate, 20) / len(els)))
+    print('render_static:            %8.2f us per field' % (best(render, 20) / len(els)))
+
+
+def select():
+    " validating a 10k value multi-select submission with 10k choose values mixed in "
+    options = [(i, 'option %d' % i) for i in range(10000)]
+    el = Form('f').add_mselect('f', options, choose=[(-1, 'choose')], required=True)
+    submitted = [str(i) for i in range(10000)] + ['-1'] * 10000
+
+    def validate():
+        el.submittedval = submitted
+        el.is_valid()
+    print('validate: %8.1f ms' % (best(validate, 10) / 1000))
+
+
+def imports():
+    " importing blazeform.form in a fresh interpreter, less the interpreter's startup "
+    def run(code):
+        return best(lambda: subprocess.check_call([sys.executable, '-c', code]), 1, 10)
+    startup = run('pass')
+    print('import: %8.1f ms' % ((run('import blazeform.form') - startup) / 1000))
+
+
+benchmarks = [construction, fields, select, imports]
+
+
+def main(names):
+    for func in benchmarks:
+        if not names or func.__name__ in names:
+            print('%s: %s' % (func.__name__, func.__doc__.strip()))
+            func()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
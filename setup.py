@@ -35,8 +35,10 @@ setup(
     packages=['blazeform'],
     install_requires = [
         "FormEncode>=1.2.2",
-        "BlazeUtils>=0.3.0",
         "WebHelpers2"
     ],
+    tests_require = [
+        "BlazeUtils>=0.3.0",
+    ],
     zip_safe=False
 )
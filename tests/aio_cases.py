@@ -0,0 +1,118 @@
+"""
+    The asyncio tests, kept out of test_aio so that the async syntax is only
+    compiled on Python 3.5+.
+"""
+from __future__ import absolute_import
+import asyncio
+import io
+
+from blazeform import aio
+from blazeform.form import Form
+
+
+class Chunks(object):
+    "an async iterable over `chunks` that counts how many were taken"
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.taken = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(0)
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            raise StopAsyncIteration
+        self.taken += 1
+        return chunk
+
+
+class AsyncDest(object):
+    def __init__(self):
+        self.written = []
+        self.active = 0
+        self.overlapped = False
+
+    async def write(self, chunk):
+        self.active += 1
+        if self.active > 1:
+            self.overlapped = True
+        await asyncio.sleep(0.001)
+        self.written.append(chunk)
+        self.active -= 1
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def make_element():
+    form = Form('f')
+    el = form.add_file('upload', 'Upload')
+    el.allow_extension('txt')
+    el.maxsize(20)
+    return el
+
+
+def test_stream_upload():
+    el = make_element()
+    translator = run(aio.stream_upload(el, 'text.txt', 'text/plain', Chunks([b'hello ', b'world'])))
+    assert not translator.errors
+    assert el.submittedval is translator
+    assert el.is_valid()
+    assert translator.read() == b'hello world'
+    assert translator.content_length == 11
+
+
+def test_stream_upload_rejected():
+    el = make_element()
+    chunks = Chunks([b'x' * 10, b'x' * 10, b'x' * 10, b'x' * 10])
+    translator = run(aio.stream_upload(el, 'text.txt', 'text/plain', chunks))
+    assert chunks.taken == 3
+    assert not el.is_valid()
+    assert el.errors == ['file too big (30), max size 20']
+
+    chunks = Chunks([b'data'])
+    translator = run(aio.stream_upload(el, 'image.png', 'image/png', chunks))
+    assert chunks.taken == 0
+    assert translator.errors == ['extension ".png" not allowed']
+
+
+def test_async_dest():
+    el = make_element()
+    dest = AsyncDest()
+    chunks = Chunks([b'ab', b'cd', b'ef'])
+    translator = run(aio.stream_upload(el, 'text.txt', 'text/plain', chunks, dest))
+    assert dest.written == [b'ab', b'cd', b'ef']
+    # writes are never run at the same time
+    assert not dest.overlapped
+    assert translator.stream is None
+    assert el.is_valid()
+
+
+def test_sync_dest():
+    el = make_element()
+    dest = io.BytesIO()
+    translator = run(aio.stream_upload(el, 'text.txt', 'text/plain', Chunks([b'ab', b'cd']),
+                                       dest))
+    assert translator.stream is dest
+    assert dest.getvalue() == b'abcd'
+    assert translator.read() == b'abcd'
+
+
+def test_chunk_reader():
+    el = make_element()
+    source = io.BytesIO(b'hello world')
+
+    async def read(size):
+        return source.read(size)
+
+    translator = run(aio.stream_upload(el, 'text.txt', 'text/plain', aio.ChunkReader(read, 4)))
+    assert translator.read() == b'hello world'
@@ -0,0 +1,14 @@
+from __future__ import absolute_import
+import sys
+from unittest import SkipTest
+
+if sys.version_info < (3, 5):
+    raise SkipTest('blazeform.aio needs Python 3.5+')
+
+from tests.aio_cases import (  # noqa: E402,F401
+    test_async_dest,
+    test_chunk_reader,
+    test_stream_upload,
+    test_stream_upload_rejected,
+    test_sync_dest,
+)
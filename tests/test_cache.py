@@ -0,0 +1,81 @@
+from __future__ import absolute_import
+
+from webhelpers2.html import literal
+
+from blazeform.cache import fingerprint, LRUCache, RenderCache
+from blazeform.form import Form
+from blazeform.util import NotGiven
+
+
+class CountingBackend(dict):
+    def __init__(self):
+        dict.__init__(self)
+        self.hits = 0
+
+    def get(self, key, default=None):
+        if key in self:
+            self.hits += 1
+        return dict.get(self, key, default)
+
+
+def make_form(cache, name='Bob', email='bob@example.com'):
+    class StaticForm(Form):
+        render_cache = cache
+
+        def __init__(self):
+            Form.__init__(self, 'f', static=True)
+            self.add_text('name', 'Name', defaultval=name)
+            self.add_email('email', 'Email', defaultval=email)
+            self.add_select('color', [(1, 'red'), (2, 'blue')], 'Color', defaultval=2)
+    return StaticForm()
+
+
+def test_fingerprint():
+    assert fingerprint('a') != fingerprint(literal('a'))
+    assert fingerprint(NotGiven) == ('NotGiven',)
+    assert fingerprint({'b': 1, 'a': [1, 2]}) == fingerprint({'a': [1, 2], 'b': 1})
+
+
+def test_lru_cache():
+    cache = LRUCache(2)
+    cache['a'] = 1
+    cache['b'] = 2
+    assert cache.get('a') == 1
+    cache['c'] = 3
+    # b was the least recently used
+    assert 'b' not in cache
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.get('b', 'missing') == 'missing'
+    assert len(cache) == 2
+
+
+def test_output_unchanged():
+    uncached = make_form(None).render()
+    assert make_form(RenderCache()).render() == uncached
+
+
+def test_form_cache_hit():
+    backend = CountingBackend()
+    cache = RenderCache(backend)
+    first = make_form(cache).render()
+    assert backend.hits == 0
+    assert make_form(cache).render() == first
+    assert backend.hits == 1
+
+
+def test_changed_fields_only_rerender():
+    backend = CountingBackend()
+    cache = RenderCache(backend)
+    make_form(cache).render()
+    html = make_form(cache, name='Alice').render()
+    assert 'Alice' in html
+    assert html == make_form(None, name='Alice').render()
+    # the form key missed, but the email and color rows came from the cache
+    assert backend.hits == 2
+
+
+def test_render_settings_in_key():
+    cache = RenderCache()
+    html = make_form(cache).render(req_note_level='form')
+    assert make_form(cache).render() != html
@@ -4,12 +4,14 @@ import decimal
 import unittest
 
 from formencode.validators import Int, MaxLength
-from webhelpers2.html import literal
+from webhelpers2.html import literal, tags
 
+from blazeform.element import MultiCheckboxElement
 from blazeform.form import Form
-from blazeform.exceptions import ValueInvalid, ProgrammingError
-from blazeform.file_upload_translators import BaseTranslator
+from blazeform.exceptions import ValueInvalid, ProgrammingError, UploadRejected
+from blazeform.file_upload_translators import BaseTranslator, StreamTranslator
 from blazeform.util import NotGiven, NotGivenIter
+from blazeutils import DumbObject
 
 L = literal
 
@@ -23,6 +25,28 @@ class CommonTest(unittest.TestCase):
         self.assertEqual(html, str(form.elements.username.render()))
         self.assertEqual(el.label.render(), L('<label for="f-username">User Name</label>'))
 
+    def test_idattr_cache(self):
+        form = Form('f')
+        el = form.add_text('username', 'User Name')
+        assert el.getidattr() == 'f-username'
+        assert el.getidattr('row') == 'f-username-row'
+        form._element_id_formatter = '%(element_id)s-%(form_name)s'
+        assert el.getidattr() == 'username-f'
+        assert el.getidattr('row') == 'username-f-row'
+        form._name = 'g'
+        assert el.getidattr('fw') == 'username-g-fw'
+        self.assertEqual(el.label.render(), L('<label for="username-g">User Name</label>'))
+
+    def test_static_attributes_cache(self):
+        form = Form('f', static=True)
+        el = form.add_text('username', 'User Name', maxlength=10)
+        attrs = el._static_attributes()
+        assert 'maxlength' not in attrs
+        assert el._static_attributes() is attrs
+        el.set_attr('title', 'foo')
+        assert el._static_attributes() is not attrs
+        assert el._static_attributes()['title'] == 'foo'
+
     def test_implicit_render(self):
         html = '<input class="text" id="f-username" name="username" type="text" />'
         form = Form('f')
@@ -36,6 +60,17 @@ class CommonTest(unittest.TestCase):
         form.add_text('username', 'User Name')
         self.assertEqual(html, str(form.elements.username(class_='text foo bar', baz='bar')))
 
+    def test_render_no_side_effects(self):
+        form = Form('f')
+        el = form.add_text('username', 'User Name', defaultval='bar')
+        attributes = dict(el.attributes)
+        html = el(class_='foo')
+        assert 'class="foo"' in html
+        assert el.attributes == attributes
+        assert el() == el()
+        assert 'class="text"' in el()
+        assert el.label.value == 'User Name'
+
     def test_text_with_default(self):
         html = '<input class="text" id="f-username" name="username" type="text" value="bar" />'
         form = Form('f')
@@ -1178,6 +1213,58 @@ class SelectTest(unittest.TestCase):
         el = Form('f').add_select('f', o, defaultval=1, choose=None, name="myselect")
         self.assertEqual(str(el()), html)
 
+    def test_el_select_cached_options(self):
+        o = [(i, 'opt <%d>' % i) for i in range(1000)]
+        el = Form('f').add_mselect('f', o, defaultval=[5, 999], choose=None)
+        expected = tags.select('f', ['5', '999'],
+                               [tags.Option(label, str(value)) for value, label in o],
+                               id='f-f', multiple='multiple')
+        self.assertEqual(el(), expected)
+        options_html = el._options_html()
+        el.defaultval = 7
+        self.assertIn('<option selected="selected" value="7">opt &lt;7&gt;</option>', el())
+        self.assertNotIn('selected="selected" value="5"', el())
+        assert el._options_html() is options_html
+
+        # changing the options rebuilds the cached html
+        el.options.append((1000, 'new'))
+        self.assertIn('<option value="1000">new</option>', el())
+
+    def test_el_mselect_many_values(self):
+        o = [(i, 'opt %d' % i) for i in range(10000)]
+        el = Form('f').add_mselect('f', o, choose=None)
+        submitted = [str(i) for i in range(10000)]
+        el.submittedval = submitted
+        self.assertEqual(el.value, submitted)
+        assert el.submittedval is submitted and len(submitted) == 10000
+
+        el = Form('f').add_mselect('f', o, choose=[(-1, 'choose')], required=True)
+        el.submittedval = submitted + ['-1'] * 10000
+        self.assertEqual(el.value, submitted)
+        processor = el.processors[-1][0]
+        compiled = processor._compiled()
+        el.submittedval = ['-1', '5']
+        self.assertEqual(el.value, ['5'])
+        assert processor._compiled() is compiled
+        el.submittedval = ['10000']
+        assert not el.is_valid()
+
+        # choose values are filtered into a new list, the submitted one is kept
+        submitted = ['-1', '5', '-1']
+        el.submittedval = submitted
+        self.assertEqual(el.value, ['5'])
+        self.assertEqual(submitted, ['-1', '5', '-1'])
+
+        # adding options or replacing the lists rebuilds the sets
+        el.options.append((10000, 'new'))
+        el.submittedval = ['10000']
+        self.assertEqual(el.value, ['10000'])
+        compiled = processor._compiled()
+        processor.invalid = ['5']
+        el.submittedval = ['5']
+        assert not el.is_valid()
+        assert processor._compiled() is not compiled
+
 
 class OtherElementsTest(unittest.TestCase):
     def test_el_textarea(self):
@@ -1373,6 +1460,37 @@ class LogicalElementsTest(unittest.TestCase):
         assert not el1.chosen
         assert not el2.chosen
 
+    def test_mcheckbox_large_group(self):
+        changed = []
+
+        class LoggedCheckbox(MultiCheckboxElement):
+            @MultiCheckboxElement.chosen.setter
+            def chosen(self, value):
+                changed.append(self.id)
+                MultiCheckboxElement.chosen.fset(self, value)
+
+        f = Form('f')
+        f.register_element_type('lcheckbox', LoggedCheckbox)
+        els = [f.add_lcheckbox('f%d' % i, 'label', 'p%d' % i, 'perms') for i in range(500)]
+        group = f.elements.perms
+        f.set_submitted({'f-submit-flag': 'submitted', 'perms': ['p1', 'p7', 'p499']})
+        assert group.value == ['p1', 'p7', 'p499']
+        assert [el.id for el in els if el.chosen] == ['f1', 'f7', 'f499']
+
+        # only members whose state changes get updated
+        del changed[:]
+        f.set_submitted({'f-submit-flag': 'submitted', 'perms': ['p1', 'p8']})
+        assert sorted(changed) == ['f499', 'f7', 'f8']
+        assert [el.id for el in els if el.chosen] == ['f1', 'f8']
+
+        # values have to come from the members, including those added after validation
+        f.set_submitted({'f-submit-flag': 'submitted', 'perms': ['p1', 'nope']})
+        assert not group.is_valid()
+        assert group.errors == ['the value did not come from the given options']
+        f.add_mcheckbox('new', 'label', 'nope', 'perms')
+        f.set_submitted({'f-submit-flag': 'submitted', 'perms': ['p1', 'nope']})
+        assert group.is_valid()
+
     def test_mcheckbox4(self):
         # test integer values
         f = Form('f')
@@ -1816,6 +1934,183 @@ class FileUploadsTest(unittest.TestCase):
         assert not el.is_valid()
         assert el.errors[0] == 'field is required'
 
+    def test_stream_upload(self):
+        el = Form('f').add_file('f')
+        el.allow_extension('txt')
+        el.maxsize(10)
+        tosub = el.stream_upload('text.txt', 'text/plain', [b'hello', b'there'])
+        assert el.is_valid()
+        assert el.value is tosub
+        assert tosub.content_length == 10
+        assert tosub.read() == b'hellothere'
+
+    def test_stream_upload_too_big(self):
+        read = []
+
+        def chunks():
+            for chunk in (b'hello', b'there', b'world', b'again'):
+                read.append(chunk)
+                yield chunk
+        el = Form('f').add_file('f')
+        el.maxsize(12)
+        tosub = el.stream_upload('text.txt', 'text/plain', chunks())
+        # reading stopped as soon as the limit was passed
+        assert read == [b'hello', b'there', b'world']
+        assert tosub.rejected
+        assert not el.is_valid()
+        self.assertEqual(el.errors, ['file too big (15), max size 12'])
+
+    def test_stream_upload_rejected_early(self):
+        read = []
+
+        def chunks():
+            read.append(1)
+            yield b'data'
+        el = Form('f').add_file('f')
+        el.deny_extension('exe')
+        el.allow_type('text/plain')
+        el.stream_upload('virus.exe', 'application/octet-stream', chunks())
+        assert read == []
+        assert not el.is_valid()
+        self.assertEqual(el.errors, ['extension ".exe" not permitted',
+                                     'content type "application/octet-stream" not allowed'])
+
+    def test_stream_factory(self):
+        el = Form('f').add_file('f')
+        el.maxsize(5)
+        translator = el.stream_factory(100, 'text/plain', 'text.txt')
+        assert isinstance(translator, StreamTranslator)
+        translator.write(b'12345')
+        try:
+            translator.write(b'6')
+            assert False, 'expected UploadRejected'
+        except UploadRejected as e:
+            assert e.translator is translator
+            el.submittedval = e.translator
+        assert not el.is_valid()
+
+        # client reported length
+        try:
+            el.stream_factory(100, 'text/plain', 'text.txt', 10)
+            assert False, 'expected UploadRejected'
+        except UploadRejected as e:
+            assert str(e) == 'file too big (10), max size 5'
+
+        # werkzeug wraps the stream in a FileStorage
+        translator = el.stream_factory(100, 'text/plain', 'text.txt')
+        translator.write(b'123')
+        el.submittedval = DumbObject(stream=translator, filename='text.txt',
+                                     content_type='text/plain', content_length=0)
+        assert el.is_valid()
+        assert el.value is translator
+
+    def test_stream_sniff_and_hash(self):
+        import hashlib
+        png = b'\x89PNG\r\n\x1a\n' + b'\x00' * 100
+        el = Form('f').add_file('f')
+        el.hash_uploads()
+        tosub = el.stream_upload('image.png', 'image/png', [png[:5], png[5:50], png[50:]])
+        assert el.is_valid()
+        assert tosub.sniffed_type == 'image/png'
+        assert tosub.hexdigest == hashlib.sha256(png).hexdigest()
+
+        # no hash unless asked for
+        tosub = Form('f').add_file('f').stream_upload('image.png', 'image/png', [png])
+        assert tosub.hexdigest is None
+        assert tosub.sniffed_type == 'image/png'
+
+        # short text file gets sniffed once it is finished
+        tosub = Form('f').add_file('f').stream_upload('text.txt', 'text/plain', [b'hi'])
+        assert tosub.sniffed_type == 'text/plain'
+
+    def test_stream_verify_type(self):
+        exe = b'MZ' + b'\x90' * 100
+        el = Form('f').add_file('f')
+        el.allow_type('image/png', 'text/csv')
+        el.verify_type()
+        el.stream_upload('image.png', 'image/png', [exe])
+        assert not el.is_valid()
+        self.assertEqual(el.errors, ['content type "application/x-msdownload" not allowed'])
+
+        # without verification the browser's type is trusted
+        el = Form('f').add_file('f')
+        el.allow_type('image/png')
+        el.stream_upload('image.png', 'image/png', [exe])
+        assert el.is_valid()
+
+        # text files keep their sent text type
+        el = Form('f').add_file('f')
+        el.allow_type('text/csv')
+        el.verify_type()
+        el.stream_upload('data.csv', 'text/csv', [b'a,b,c\n1,2,3\n' * 5])
+        assert el.is_valid()
+
+
+class RepeatTest(unittest.TestCase):
+
+    def lines(self, **kwargs):
+        form = Form('f')
+        el = form.add_repeat('lines', 'Lines', **kwargs)
+        el.row.add_text('item', 'Item', required=True)
+        el.row.add_text('qty', 'Qty', 'int')
+        return form, el
+
+    def test_values(self):
+        form, el = self.lines()
+        el.submittedval = [{'item': 'nail', 'qty': str(i)} for i in range(500)]
+        assert el.is_valid()
+        assert len(el.value) == 500
+        assert el.value[42] == {'item': 'nail', 'qty': 42}
+        # all rows were validated with the same row elements
+        assert list(el.row.els) == ['item', 'qty']
+
+    def test_html_submit(self):
+        form, el = self.lines()
+        form.set_submitted({'f-submit-flag': 'submitted', 'lines-0-item': '',
+                            'lines-0-qty': '', 'lines-1-item': 'nail', 'lines-1-qty': '1',
+                            'lines-2-item': '', 'lines-2-qty': 'x'})
+        assert not form.is_valid()
+        # the empty row is skipped, errors keep the submitted row indexes
+        assert el.row_errors[2] == {'item': ['field is required'],
+                                    'qty': ['Please enter an integer value']}
+        assert [(error.eid, error.code) for error in el.iter_errors()] == \
+            [('lines-2-item', 'required'), ('lines-2-qty', 'integer')]
+
+        form.set_submitted({'f-submit-flag': 'submitted', 'lines-0-item': 'nail'})
+        assert form.is_valid()
+        assert form.get_values()['lines'] == [{'item': 'nail', 'qty': None}]
+
+    def test_row_counts(self):
+        form, el = self.lines(required=True, max_rows=2)
+        el.submittedval = []
+        assert not el.is_valid()
+        assert [error.code for error in el.iter_errors()] == ['required']
+        el.submittedval = [{'item': 'a'}] * 3
+        assert not el.is_valid()
+        assert el.errors == ['enter no more than 2 rows']
+
+        form, el = self.lines(min_rows=2)
+        el.submittedval = [{'item': 'a'}]
+        assert not el.is_valid()
+        assert [error.code for error in el.iter_errors()] == ['tooFewRows']
+
+    def test_render(self):
+        form, el = self.lines()
+        el.submittedval = [{'item': 'nail', 'qty': '2'}]
+        html = el.render()
+        assert html.startswith('<table class="repeat" id="f-lines">')
+        assert '<th>Item</th><th>Qty</th>' in html
+        assert '<input class="text" id="f-lines-0-qty" name="lines-0-qty" type="text" ' \
+            'value="2" />' in html
+        # the extra row, from the row template
+        assert 'name="lines-1-item"' in html
+        assert 'lines-2' not in html
+        assert el.row_template(7) == el.row_template().replace('__index__', '7')
+        assert el.row_template()[:4] == '<tr>'
+
+        bound = form.bind()
+        assert bound.elements.lines.render() == el.render()
+
 
 # need to test adding group first and then members
 # test setting attributes for each element with a render()
@@ -0,0 +1,101 @@
+from __future__ import absolute_import
+import json
+import pickle
+
+import formencode.validators as fev
+
+from blazeform.errors import FieldError
+from blazeform.form import Form
+
+
+def submit(form, **values):
+    values['%s-submit-flag' % form._name] = 'submitted'
+    form.set_submitted(values)
+    return form
+
+
+def test_field_error():
+    error = FieldError('f', 'tooBig', 'file too big (%(size)s)', {'size': 10})
+    assert error == 'file too big (10)'
+    assert str(error) == 'file too big (10)'
+    assert error.as_dict() == {'code': 'tooBig', 'message': 'file too big (10)'}
+    assert error == FieldError('f', 'tooBig', 'file too big (10)')
+    assert error != FieldError('g', 'tooBig', 'file too big (10)')
+    copied = pickle.loads(pickle.dumps(error))
+    assert (copied, copied.eid, copied.code, copied.params) == \
+        (error, 'f', 'tooBig', {'size': 10})
+
+
+class Catalog(object):
+    def __init__(self):
+        self.looked_up = []
+
+    def gettext(self, template):
+        self.looked_up.append(template)
+        return template.upper()
+
+
+def test_lazy_messages():
+    form = Form('f')
+    form.catalog = catalog = Catalog()
+    form.add_text('name', 'Name', required=True)
+    form.add_text('other', 'Other', required=True)
+    submit(form)
+    assert not form.is_valid()
+    # counting codes doesn't look up or format any messages
+    assert [error.code for error in form.iter_errors()] == ['required', 'required']
+    assert catalog.looked_up == []
+    assert form.elements.name.errors == ['FIELD IS REQUIRED']
+    assert catalog.looked_up == ['field is required']
+
+    # element errors are strings
+    errors = form.elements.name.errors + form.elements.other.errors
+    assert json.dumps(errors) == '["FIELD IS REQUIRED", "FIELD IS REQUIRED"]'
+    assert ', '.join(errors) == 'FIELD IS REQUIRED, FIELD IS REQUIRED'
+
+
+def test_element_codes():
+    form = Form('f')
+    form.add_text('name', 'Name', required=True)
+    form.add_text('age', 'Age', 'int')
+    form.add_text('code', 'Code', maxlength=3)
+    el = form.add_text('email', 'Email')
+    el.add_processor(fev.Email, 'bad email')
+    form.add_validator(fev.Int)
+    submit(form, age='old', code='abcd', email='nope')
+    assert not form.is_valid()
+
+    errors = dict((error.eid, error) for error in form.iter_errors())
+    assert errors['name'].code == 'required'
+    assert errors['age'].code == 'integer'
+    assert errors['code'].code == 'tooLong'
+    assert errors['code'].params == {'maxLength': 3}
+    # a custom message keeps the validator's code
+    assert errors['email'].code == 'noAt'
+    assert errors['email'] == 'bad email'
+    assert errors[None].code == 'integer'
+
+    # the string API still works
+    assert form.elements.name.errors == ['field is required']
+    assert form.all_errors(id_as_key=True)[1]['code'] == \
+        ['Enter a value not greater than 3 characters long']
+
+
+def test_added_errors():
+    form = Form('f')
+    el = form.add_text('name', 'Name')
+    el.add_error('taken', 'unique')
+    form.add_error('try again')
+    form.add_field_errors({'name': 'too short'})
+    assert [(e.eid, e.code, str(e)) for e in form.iter_errors()] == \
+        [(None, 'invalid', 'try again'), ('name', 'unique', 'taken'),
+         ('name', 'invalid', 'too short')]
+
+
+def test_file_codes():
+    form = Form('f')
+    el = form.add_file('upload')
+    el.allow_extension('txt')
+    errors = el._check_name('image.png')
+    assert [error.code for error in errors] == ['extension']
+    assert errors == ['extension ".png" not allowed']
@@ -0,0 +1,142 @@
+from __future__ import absolute_import
+import io
+
+from blazeutils import DumbObject
+
+from blazeform.file_upload_translators import BaseTranslator, StreamTranslator, \
+    WerkzeugTranslator, StarletteTranslator, FieldStorageTranslator, DictTranslator, \
+    TupleTranslator, TranslatorRegistry, translators, sniff_content_type
+from blazeform.form import Form
+
+
+def test_sniff_content_type():
+    assert sniff_content_type(b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR') == 'image/png'
+    assert sniff_content_type(b'RIFF\x00\x00\x00\x00WEBPVP8 ') == 'image/webp'
+    assert sniff_content_type(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n') == 'application/pdf'
+    assert sniff_content_type(b'just some text') == 'text/plain'
+    assert sniff_content_type(u'caf\xe9 caf\xe9 ca'.encode('utf-8')[:15]) == 'text/plain'
+    assert sniff_content_type(b'\x00\x01\x02\x03') is None
+
+
+def test_no_stream():
+    translator = BaseTranslator('text.txt', 'text/plain', 10)
+    assert translator.read() == b''
+    assert translator.buffer().tobytes() == b''
+    translator.close()
+
+
+def test_in_memory_buffer():
+    translator = StreamTranslator('text.txt', 'text/plain')
+    assert translator.feed([b'hello ', b'world'])
+    buf = translator.buffer()
+    assert buf.tobytes() == b'hello world'
+    # viewed in place, nothing written to disk
+    assert not translator.stream._rolled
+    assert translator._mmap is None
+    assert translator.read() == b'hello world'
+    translator.close()
+
+
+def test_spooled_to_disk():
+    translator = StreamTranslator('text.txt', 'text/plain')
+    translator.spool_size = 10
+    assert translator.feed([b'x' * 8, b'y' * 8])
+    assert translator.stream._rolled
+    buf = translator.buffer()
+    assert buf.tobytes() == b'x' * 8 + b'y' * 8
+    assert translator._mmap is not None
+    assert translator.buffer() is buf
+    translator.close()
+    assert translator._mmap is None
+    assert translator.stream.closed
+
+
+def test_context_manager():
+    with StreamTranslator('text.txt', 'text/plain') as translator:
+        translator.feed([b'data'])
+        assert translator.buffer().tobytes() == b'data'
+    assert translator.stream.closed
+
+
+def test_werkzeug_stream():
+    value = DumbObject(filename='text.txt', content_type='text/plain', content_length=4,
+                       stream=io.BytesIO(b'data'))
+    translator = WerkzeugTranslator(value)
+    assert translator.stream is value.stream
+    assert translator.read() == b'data'
+    assert translator.buffer().tobytes() == b'data'
+    translator.close()
+    assert value.stream.closed
+
+
+class FakeUploadFile(object):
+    "quacks like Starlette's UploadFile"
+    def __init__(self, filename, data, content_type):
+        self.filename = filename
+        self.content_type = content_type
+        self.file = io.BytesIO(data)
+
+
+class FakeFieldStorage(object):
+    "quacks like cgi.FieldStorage"
+    def __init__(self, filename, data, type):
+        self.filename = filename
+        self.type = type
+        self.file = io.BytesIO(data)
+
+
+def check_translated(value, translator_class, content_type='text/plain'):
+    translator = translators(value)
+    assert type(translator) is translator_class
+    assert translator.file_name == 'text.txt'
+    assert translator.content_type == content_type
+    assert translator.content_length == 4
+    assert translator.read() == b'data'
+
+
+def test_registry_dispatch():
+    check_translated(FakeUploadFile('text.txt', b'data', 'text/plain'), StarletteTranslator)
+    check_translated(FakeFieldStorage('text.txt', b'data', 'text/plain'),
+                     FieldStorageTranslator)
+    check_translated({'filename': 'text.txt', 'body': b'data', 'content_type': 'text/plain'},
+                     DictTranslator)
+    check_translated({'filename': 'text.txt', 'file': io.BytesIO(b'data'),
+                      'type': 'text/plain'}, DictTranslator)
+    check_translated(('text.txt', b'data', 'text/plain'), TupleTranslator)
+    # content type guessed from the file name
+    check_translated(('text.txt', io.BytesIO(b'data')), TupleTranslator)
+    check_translated(DumbObject(filename='text.txt', content_type='text/plain',
+                                content_length=4, stream=io.BytesIO(b'data')),
+                     WerkzeugTranslator)
+
+
+def test_registry_cache():
+    registry = TranslatorRegistry(WerkzeugTranslator, FieldStorageTranslator)
+    werkzeug = DumbObject(filename='a.txt', content_type='text/plain', content_length=0)
+    assert registry.translator_for(werkzeug) is WerkzeugTranslator
+    assert registry._by_type[DumbObject] is WerkzeugTranslator
+    # same type, but the cached translator doesn't accept it
+    cgi = DumbObject(filename='a.txt', type='text/plain', file=io.BytesIO())
+    assert registry.translator_for(cgi) is FieldStorageTranslator
+    assert registry._by_type[DumbObject] is FieldStorageTranslator
+
+    try:
+        registry(('a.txt', b''))
+        assert False
+    except TypeError as e:
+        assert 'no file upload translator accepts' in str(e)
+
+    registry.register(TupleTranslator)
+    assert not registry._by_type
+    assert type(registry(('a.txt', b''))) is TupleTranslator
+
+
+def test_form_registry():
+    form = Form('f')
+    el = form.add_file('file')
+    el.allow_type('text/plain')
+    form.set_submitted({'f-submit-flag': 'submitted', 'file': ('text.txt', b'data')})
+    assert form.is_valid()
+    assert form.elements.file.value.read() == b'data'
+    form.set_submitted({'f-submit-flag': 'submitted', 'file': ('image.png', b'data')})
+    assert not form.is_valid()
@@ -1,10 +1,12 @@
 from __future__ import absolute_import
 from formencode.validators import Int
+import subprocess
+import sys
 import unittest
 
 from webhelpers2.html.builder import literal
 
-from blazeform.form import Form
+from blazeform.form import ApiForm, Form
 from blazeform.element import TextElement
 from blazeform.exceptions import ValueInvalid, ElementInvalid, ProgrammingError
 from blazeform.util import NotGiven
@@ -222,6 +224,56 @@ class CommonFormUsageTest(unittest.TestCase):
         assert 'selected="selected"' not in el1()
         assert 'selected="selected"' not in el2()
 
+    def multi_form(self):
+        f = Form('f')
+        f.add_text('name', 'Name')
+        f.add_mselect('colors', [(1, 'red'), (2, 'blue')], 'Colors', 'int')
+        f.add_mcheckbox('p1', 'Read', 'read', 'perms')
+        f.add_mcheckbox('p2', 'Write', 'write', 'perms')
+        f.add_checkbox('active', 'Active')
+        return f
+
+    def test_submit_pairs(self):
+        f = self.multi_form()
+        # like urllib's parse_qsl() returns
+        f.set_submitted([('f-submit-flag', 'submitted'), ('name', 'bob'), ('name', 'jim'),
+                         ('colors', '1'), ('colors', '2'), ('perms', 'read'),
+                         ('perms', 'write')])
+        assert f.get_values() == {'f-submit-flag': 'submitted', 'name': 'bob',
+                                  'colors': [1, 2], 'perms': ['read', 'write'],
+                                  'active': False}
+
+    def test_submit_multidict(self):
+        class MultiDict(dict):
+            def getlist(self, key):
+                value = dict.__getitem__(self, key)
+                return value if isinstance(value, list) else [value]
+
+            def __getitem__(self, key):
+                value = dict.__getitem__(self, key)
+                return value if not isinstance(value, list) else value[0]
+
+        f = self.multi_form()
+        f.set_submitted(MultiDict({'f-submit-flag': 'submitted', 'colors': ['2', '1'],
+                                   'perms': 'write', 'active': 'on'}))
+        values = f.get_values()
+        assert values['colors'] == [2, 1]
+        assert values['perms'] == ['write']
+        assert values['active'] is True
+
+    def test_submission_map(self):
+        f = self.multi_form()
+        submission_map = f._submission_map()
+        assert f._submission_map() is submission_map
+        assert f.bind()._submission_map() is submission_map
+        assert ('colors', 'colors', True, True) in submission_map
+        assert ('name', 'name', False, False) in submission_map
+        f.add_text('other')
+        assert f._submission_map() is not submission_map
+        f.elements.other.nameattr = 'renamed'
+        f.set_submitted({'f-submit-flag': 'submitted', 'renamed': 'x'})
+        assert f.elements.other.value == 'x'
+
     def test_dup_fields(self):
         f = Form('f')
         f.add_text('f')
@@ -231,6 +283,51 @@ class CommonFormUsageTest(unittest.TestCase):
         except ValueError:
             pass
 
+    def test_add_elements(self):
+        f = Form('f')
+        els = f.add_elements([
+            {'type': 'text', 'eid': 'name', 'label': 'Name', 'required': True},
+            ('select', 'color', [(1, 'red'), (2, 'blue')], 'Color', {'choose': None}),
+            ('email', 'email'),
+        ])
+        assert [el.id for el in els] == ['name', 'color', 'email']
+        assert list(f.els.keys())[-3:] == ['name', 'color', 'email']
+        assert f.elements.name.required
+        assert f.elements.color.label.value == 'Color'
+        assert "multipart/form-data" not in f.render()
+
+        g = f.add_elgroup('group')
+        pic, = g.add_elements([('file', 'picture', 'Picture')])
+        assert g.elements.picture is pic
+        assert pic.renders_in_group
+        assert "multipart/form-data" in f.render()
+
+        # a bad spec anywhere leaves the form unchanged
+        count = len(f.els)
+        for specs in (
+            [('text', 'a'), ('nope', 'b')],
+            [('text', 'a'), ('text', 'a')],
+            [('text', 'a'), ('text', 'name')],
+            [('text', 'a'), {'eid': 'b'}],
+            [('text', 'a'), 'b'],
+        ):
+            try:
+                f.add_elements(specs)
+                self.fail('should have raised ValueError for %r' % (specs,))
+            except ValueError:
+                pass
+            assert len(f.els) == count
+
+        # as does an element that fails to construct
+        f = Form('f')
+        try:
+            f.add_elements([('text', 'a'), ('file', 'b'), ('select', 'c')])
+            self.fail('should have raised TypeError for a select without options')
+        except TypeError:
+            pass
+        assert list(f.els.keys()) == ['f-submit-flag']
+        assert "multipart/form-data" not in f.render()
+
     def test_is_valid(self):
         f = Form('f')
         f.add_text('f')
@@ -248,6 +345,49 @@ class CommonFormUsageTest(unittest.TestCase):
         f.set_submitted({'f-submit-flag': 'submitted', 'f': 'foo'})
         assert f.is_valid()
 
+    def test_is_valid_only(self):
+        f = Form('f')
+        f.add_text('f1', required=True)
+        f.add_text('f2', required=True)
+        f.add_validator(lambda form: form.elements.f2.value)
+        f.set_submitted({'f-submit-flag': 'submitted', 'f1': 'foo'})
+        assert f.is_valid(only=['f1'])
+        assert f.elements.f2._valid is None
+        assert not f.is_valid(only=['f1', 'f2'])
+        assert not f.is_valid()
+
+    def test_get_values_only(self):
+        f = Form('f')
+        f.add_text('f1')
+        f.add_text('f2')
+        f.set_submitted({'f-submit-flag': 'submitted', 'f1': 'foo', 'f2': 'bar'})
+        assert f.get_values(only=['f2']) == {'f2': 'bar'}
+        assert f.get_values(only='f1') == {'f1': 'foo'}
+
+    def test_render_only(self):
+        f = Form('f')
+        f.add_text('f1', 'Field 1')
+        f.add_text('f2', 'Field 2')
+        html = f.render(only=['f2'])
+        assert 'f-f1-row' not in html
+        assert 'f-f2-row' in html
+        # submit flag is always rendered so the fragment can be submitted
+        assert 'f-submit-flag' in html
+
+    def test_render_section(self):
+        f = Form('f')
+        f.add_text('f1', 'Field 1')
+        f.add_header('h1', 'Header 1')
+        f.add_text('f2', 'Field 2')
+        f.add_header('h2', 'Header 2')
+        f.add_text('f3', 'Field 3')
+        html = f.render(section='h1')
+        assert 'f-h1-section' in html
+        assert 'f-h2-section' not in html
+        assert 'f-f1-row' not in html
+        assert 'f-f2-row' in html
+        assert 'f-f3-row' not in html
+
     def test_form_validators(self):
         def validator(form):
             if form.elements.myfield.is_valid():
@@ -466,6 +606,164 @@ class CommonFormUsageTest(unittest.TestCase):
         self.assertEqual(field_errors, {'field': ['field is required']})
 
 
+class BindTest(unittest.TestCase):
+
+    def schema(self):
+        f = Form('f')
+        f.add_text('name', 'Name', required=True)
+        f.add_password('password', 'Password')
+        f.add_confirm('confirm', 'Confirm', match='password')
+        f.add_mcheckbox('mc1', 'Check 1', 1, 'cgroup')
+        f.add_mcheckbox('mc2', 'Check 2', 2, 'cgroup')
+        g = f.add_elgroup('group')
+        g.add_submit('submit')
+        return f
+
+    def test_independent_state(self):
+        schema = self.schema()
+        f1 = schema.bind()
+        f2 = schema.bind()
+        f1.set_submitted({'f-submit-flag': 'submitted', 'name': 'bob', 'cgroup': ['1']})
+        f2.set_submitted({'f-submit-flag': 'submitted'})
+        assert f1.is_valid()
+        assert not f2.is_valid()
+        assert f1.elements.name.value == 'bob'
+        assert f2.elements.name.errors == ['field is required']
+        assert f1.elements.mc1.chosen
+        assert not f2.elements.mc1.chosen
+
+        # the schema is untouched
+        assert not schema.is_submitted()
+        assert schema.elements.name.errors == []
+        assert not schema.elements.mc1.chosen
+
+    def test_references_bound(self):
+        f = self.schema().bind()
+        assert f.elements.confirm.mel is f.elements.password
+        assert f.elements.mc1.lgroup is f.elements.cgroup
+        assert f.elements.cgroup.members[1] is f.elements.mc1
+        assert f.elements.group.elements.submit is f.elements.submit
+        assert f.elements.name.form is f
+        assert f.elements.name.label.element is f.elements.name
+        assert f.add_text('other').form is f
+
+    def test_confirm(self):
+        schema = self.schema()
+        f1 = schema.bind()
+        f1.set_submitted({'f-submit-flag': 'submitted', 'name': 'bob', 'password': 'foo',
+                          'confirm': 'foo'})
+        assert f1.is_valid()
+        f2 = schema.bind()
+        f2.set_submitted({'f-submit-flag': 'submitted', 'name': 'bob', 'password': 'foo',
+                          'confirm': 'bar'})
+        assert not f2.is_valid()
+
+    def test_render(self):
+        schema = self.schema()
+        html = schema.render()
+        f = schema.bind()
+        f.elements.name.set_attr('class', 'changed')
+        assert 'changed' in f.render()
+        assert schema.render() == html
+
+    def test_threads(self):
+        import threading
+        schema = self.schema()
+        results = {}
+
+        def handle(name):
+            f = schema.bind()
+            f.set_submitted({'f-submit-flag': 'submitted', 'name': name})
+            results[name] = f.is_valid() and f.elements.name.value
+        threads = [threading.Thread(target=handle, args=('user%d' % i,)) for i in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert results == dict(('user%d' % i, 'user%d' % i) for i in range(10))
+
+
+class ApiFormTest(unittest.TestCase):
+    def schema(self):
+        f = ApiForm()
+        f.add_text('name', 'Name', required=True, maxlength=5)
+        f.add_text('age', 'Age', 'int')
+        f.add_mselect('colors', [(1, 'red'), (2, 'blue')], 'Colors')
+        f.add_checkbox('active', 'Active')
+        g = f.add_elgroup('address')
+        g.add_text('city', 'City')
+        return f
+
+    def test_headless(self):
+        f = self.schema()
+        assert f._form_ident_field not in f.els
+        assert 'id' not in f.elements.name.attributes
+        assert not f.is_submitted()
+        assert not f.is_valid()
+
+        # labels are only built when asked for
+        el = f.elements.name
+        assert el._label is None
+        assert f.bind().elements.name._label is None
+        assert el.label.value == 'Name'
+        assert el.label.element is el
+        assert Form('f').add_text('name', 'Name')._label is not None
+
+    def test_validate(self):
+        f = self.schema()
+        assert f.validate({'name': 'Bob', 'age': 42, 'colors': [1, 2], 'active': True,
+                           'address': {'city': 'Paris'}})
+        assert f.get_values() == {'name': 'Bob', 'age': 42, 'colors': [1, 2], 'active': True,
+                                  'city': 'Paris'}
+        assert f.error_dict() == {'form': [], 'fields': {}}
+
+        f = self.schema().bind()
+        f.add_validator(Int, 'form error')
+        assert not f.validate({'name': 'Robert', 'age': 'old', 'colors': [3]})
+        errors = f.error_dict()
+        assert errors['form'] == [{'code': 'integer', 'message': 'form error'}]
+        assert errors['fields']['name'] == \
+            [{'code': 'tooLong', 'message': 'Enter a value not greater than 5 characters long'}]
+        assert errors['fields']['age'][0]['code'] == 'integer'
+        assert sorted(errors['fields']) == ['age', 'colors', 'name']
+        assert not f.validate({})
+        assert f.error_dict()['fields'] == \
+            {'name': [{'code': 'required', 'message': 'field is required'}]}
+
+    def test_validate_no_upload(self):
+        f = ApiForm()
+        f.add_file('upload', 'Upload')
+        assert f.validate({'upload': None})
+        assert f.elements.upload.submittedval is NotGiven
+        assert f.get_values() == {'upload': None}
+        f.elements.upload.required = True
+        assert not f.validate({'upload': None})
+        assert f.error_dict()['fields']['upload'][0]['code'] == 'required'
+
+
+lazy_import_script = """
+import sys
+from blazeform.form import Form
+loaded = [name for name in ('formencode', 'webhelpers2', 'cgi', 'blazeutils',
+                            'blazeform.processors', 'blazeform.markup') if name in sys.modules]
+form = Form('f')
+form.add_text('name', 'Name', maxlength=3)
+form.add_text('age', 'Age', 'int')
+form.set_submitted({'f-submit-flag': 'submitted', 'name': 'abcd', 'age': '5'})
+assert not form.is_valid()
+assert 'formencode' in sys.modules and 'webhelpers2' not in sys.modules
+assert form.elements.name.errors == ['Enter a value not greater than 3 characters long']
+print(' '.join(loaded))
+"""
+
+
+class ImportTest(unittest.TestCase):
+    def test_lazy_imports(self):
+        # in a fresh interpreter, so modules other tests imported don't count
+        output = subprocess.check_output([sys.executable, '-c', lazy_import_script])
+        self.assertEqual(output.decode('ascii').strip(), '')
+
+
 # run the tests if module called directly
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,76 @@
+from __future__ import absolute_import
+
+import formencode.api
+import formencode.validators as fev
+
+from blazeform.exceptions import ValueInvalid
+from blazeform.form import ApiForm, Form
+from blazeform.i18n import Catalog, get_catalog
+
+
+def submit(form, **values):
+    values['%s-submit-flag' % form._name] = 'submitted'
+    form.set_submitted(values)
+    return form
+
+
+def test_get_catalog():
+    catalog = get_catalog('de')
+    assert get_catalog('de') is catalog
+    assert get_catalog('fr') is not catalog
+    # FormEncode's own messages come with it
+    assert catalog.gettext('Please enter an integer value') == 'Bitte eine ganze Zahl eingeben'
+    assert catalog.gettext('no such message') == 'no such message'
+
+
+def reject(value):
+    raise ValueInvalid('rejected')
+
+
+def test_translated_errors():
+    form = Form('f')
+    form.catalog = Catalog({
+        'field is required': 'Pflichtfeld',
+        'file too big (%(size)s), max size %(max)s': 'Datei zu gross (%(size)s > %(max)s)',
+        'custom': 'eigene',
+    })
+    form.add_text('name', 'Name', required=True)
+    form.add_text('age', 'Age', 'int')
+    form.add_text('other', 'Other').add_processor(reject, 'custom')
+    submit(form, age='old', other='x')
+    assert not form.is_valid()
+    assert form.elements.name.errors == ['Pflichtfeld']
+    # not in the dict, so left alone
+    assert form.elements.age.errors == ['Please enter an integer value']
+    assert [error.code for error in form.elements.age.iter_errors()] == ['integer']
+    assert form.elements.other.errors == ['eigene']
+
+    el = form.add_file('upload')
+    el.maxsize(10)
+    assert el._check_size(20) == ['Datei zu gross (20 > 10)']
+
+
+def test_formencode_messages():
+    form = ApiForm()
+    form.catalog = get_catalog('de')
+    form.add_text('age', 'Age', 'int')
+    assert not form.validate({'age': 'old'})
+    assert form.error_dict()['fields'] == \
+        {'age': [{'code': 'integer', 'message': 'Bitte eine ganze Zahl eingeben'}]}
+
+
+def test_formencode_translation():
+    # without a catalog, FormEncode's own translation settings are used
+    stdtrans = formencode.api._stdtrans
+    formencode.api.set_stdtranslation(languages=['de'])
+    try:
+        form = ApiForm()
+        form.add_text('age', 'Age', 'int')
+        form.add_validator(fev.Int)
+        assert not form.validate({'age': 'old'})
+        assert form.error_dict() == {
+            'form': [{'code': 'integer', 'message': 'Bitte eine ganze Zahl eingeben'}],
+            'fields': {'age': [{'code': 'integer', 'message': 'Bitte eine ganze Zahl eingeben'}]},
+        }
+    finally:
+        formencode.api._stdtrans = stdtrans
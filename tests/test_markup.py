@@ -0,0 +1,43 @@
+from __future__ import absolute_import
+
+from webhelpers2.html import HTML, literal
+
+from blazeform.form import Form
+from blazeform.markup import attr_html, tag
+
+
+def check_same(tag_name, static, *content, **dynamic):
+    attrs = dict(static)
+    attrs.update(dynamic)
+    expected = HTML.tag(tag_name, *content, **attrs)
+    assert tag(tag_name, attr_html(static), *content, **dynamic) == expected
+
+
+def test_same_as_webhelpers():
+    check_same('input', {'id': 'f-a', 'class': 'x'}, type='text', value='a "b" <c> & d')
+    check_same('input', {'id': 'f-a', 'title': literal('<b>')}, type='text', value=0)
+    check_same('input', {'id': 'f-a', 'checked': 'checked'}, type='checkbox', checked=None)
+    check_same('input', {'id': 'f-a', 'disabled': True}, type='checkbox', checked=True)
+    check_same('input', {'id': 'f-a', 'readonly': False, 'data_foo': 1, 'for_': 'b'})
+    check_same('span', {'class': ['a', ('b', False), ('c', True)]}, 'x < y')
+    check_same('select', {'id': 'f-s', 'multiple': 'multiple'}, HTML.NL, name='s')
+    check_same('textarea', {'rows': 7, 'cols': 40}, '', name='t')
+    check_same('span', {'id': 'f-a'}, None)
+    check_same('div', {})
+    assert tag('div', attr_html({'id': 'a'}), _closed=False) == \
+        HTML.tag('div', id='a', _closed=False)
+
+
+def test_element_attr_html_cache():
+    form = Form('f')
+    el = form.add_text('a', 'A')
+    html = el._attr_html()
+    assert el._attr_html() is html
+    el.set_attr('class', 'x')
+    assert el._attr_html() is not html
+    assert 'class="x"' in el()
+    el.nameattr = 'b'
+    assert 'name="b"' in el()
+    # render kwargs don't touch the cache
+    assert 'title="t"' in el(title='t')
+    assert 'title' not in el()
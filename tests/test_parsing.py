@@ -0,0 +1,207 @@
+from __future__ import absolute_import
+
+from six.moves.urllib.parse import quote
+
+from blazeform import parsing
+from blazeform.exceptions import SubmissionRejected
+from blazeform.form import Form
+from blazeform.parsing import content_type_params, parse_multipart, parse_urlencoded
+from blazeform.util import NotGiven
+
+
+def wanted(key):
+    return key in ('name', 'tags', 'upload')
+
+
+multipart = (
+    b'--XyZ\r\n'
+    b'Content-Disposition: form-data; name="name"\r\n\r\n'
+    b'J\xc3\xa9r\xc3\xb4me\r\n'
+    b'--XyZ\r\n'
+    b'Content-Disposition: form-data; name="junk"\r\n\r\n' +
+    b'x' * 1000 + b'\r\n'
+    b'--XyZ\r\n'
+    b'Content-Disposition: form-data; name="upload"; filename="a.txt"\r\n'
+    b'Content-Type: text/plain\r\n\r\n'
+    b'line 1\r\nline 2\r\n'
+    b'--XyZ--\r\n'
+)
+
+
+def test_content_type_params():
+    assert content_type_params('multipart/form-data; boundary="XyZ"; charset=utf-8') == \
+        ('multipart/form-data', {'boundary': 'XyZ', 'charset': 'utf-8'})
+    assert content_type_params('Application/X-WWW-Form-Urlencoded') == \
+        ('application/x-www-form-urlencoded', {})
+
+
+def test_parse_urlencoded():
+    body = b'name=J%C3%A9r%C3%B4me+B&junk=' + b'x' * 1000 + b'&tags=a&tags=b&&flag'
+    assert parse_urlencoded(body, wanted) == \
+        [('name', u'J\xe9r\xf4me B'), ('tags', 'a'), ('tags', 'b')]
+
+
+def test_urlencoded_limits():
+    try:
+        parse_urlencoded(b'a=1&b=2&c=3', wanted, max_fields=2)
+        assert False
+    except SubmissionRejected as e:
+        assert e.error.code == 'tooManyFields'
+
+    # values of unused keys are not checked
+    assert parse_urlencoded(b'junk=' + b'x' * 100 + b'&name=bob', wanted,
+                            max_value_length=10) == [('name', 'bob')]
+    try:
+        parse_urlencoded(b'name=' + b'x' * 11, wanted, max_value_length=10)
+        assert False
+    except SubmissionRejected as e:
+        assert e.error.code == 'valueTooLong'
+        assert e.error.eid == 'name'
+        assert str(e) == 'value longer than 10 characters submitted'
+
+    # percent-encoded multibyte characters count as one character each
+    name = quote(u'\u65e5\u672c\u8a9e\u3067\u3059'.encode('utf-8'))
+    tags = quote(u'\U0001f600'.encode('utf-8')) * 10
+    body = u'name=%s&tags=%s' % (name, tags)
+    assert parse_urlencoded(body.encode('ascii'), wanted, max_value_length=10) == \
+        [('name', u'\u65e5\u672c\u8a9e\u3067\u3059'), ('tags', u'\U0001f600' * 10)]
+
+
+def test_long_keys():
+    decoded = []
+
+    def unquote(raw, charset):
+        decoded.append(raw)
+        return unquote_orig(raw, charset)
+    unquote_orig = parsing._unquote
+    parsing._unquote = unquote
+    try:
+        # keys that can't decode to one of 6 characters or less aren't decoded
+        body = b'n%61me=bob&' + b'%FF' * 100 + b'=x&tags=' + b'x' * 100
+        assert parse_urlencoded(body, wanted, max_key_length=6) == \
+            [('name', 'bob'), ('tags', 'x' * 100)]
+        assert decoded == [b'n%61me', b'bob', b'tags', b'x' * 100]
+    finally:
+        parsing._unquote = unquote_orig
+
+
+def test_parse_multipart():
+    assert parse_multipart(multipart, 'XyZ', wanted) == [
+        ('name', u'J\xe9r\xf4me'),
+        ('upload', ('a.txt', b'line 1\r\nline 2', 'text/plain')),
+    ]
+    try:
+        parse_multipart(multipart, 'XyZ', wanted, max_fields=2)
+        assert False
+    except SubmissionRejected as e:
+        assert e.error.code == 'tooManyFields'
+
+
+def test_set_submitted_raw():
+    form = Form('f')
+    form.add_text('name', 'Name')
+    form.add_mselect('tags', ['a', 'b', 'c'], 'Tags')
+    form.add_checkbox('active', 'Active')
+    form.add_file('upload', 'Upload')
+    form.set_submitted_raw(b'f-submit-flag=submitted&name=bob&tags=a&tags=c&junk=1',
+                           'application/x-www-form-urlencoded')
+    assert form.get_values() == {'f-submit-flag': 'submitted', 'name': 'bob',
+                                 'tags': ['a', 'c'], 'active': False, 'upload': None}
+
+    body = multipart.replace(b'--XyZ\r\n', b'--XyZ\r\nContent-Disposition: form-data; '
+                             b'name="f-submit-flag"\r\n\r\nsubmitted\r\n--XyZ\r\n', 1)
+    form.set_submitted_raw(body, 'multipart/form-data; boundary=XyZ')
+    assert form.elements.name.value == u'J\xe9r\xf4me'
+    upload = form.elements.upload.value
+    assert upload.file_name == 'a.txt'
+    assert upload.content_type == 'text/plain'
+    assert upload.read() == b'line 1\r\nline 2'
+
+    try:
+        form.set_submitted_raw(b'{}', 'application/json')
+        assert False
+    except ValueError as e:
+        assert 'application/json' in str(e)
+
+
+def test_raw_repeat():
+    form = Form('f')
+    lines = form.add_repeat('lines')
+    lines.row.add_text('qty', 'Qty', 'int')
+    form.set_submitted_raw(b'f-submit-flag=submitted&lines-0-qty=1&lines-1-qty=2&x=3',
+                           'application/x-www-form-urlencoded')
+    assert form.get_values()['lines'] == [{'qty': 1}, {'qty': 2}]
+    # row keys are "lines-<index>-qty"
+    assert form._max_key_length() == len('lines-') + 20 + len('-qty')
+
+
+def rejected(form, values):
+    values['f-submit-flag'] = 'submitted'
+    try:
+        form.set_submitted(values)
+    except SubmissionRejected as e:
+        return e.error
+    assert False, 'submission should have been rejected'
+
+
+def test_submission_limits():
+    form = Form('f')
+    form.max_lengths = {'text': 10, 'textarea': 100}
+    form.max_values = 5
+    form.max_total_length = 150
+    form.add_text('name', 'Name')
+    form.add_textarea('bio', 'Bio')
+    form.add_mselect('tags', list('abcdefgh'), 'Tags')
+
+    form.set_submitted({'f-submit-flag': 'submitted', 'name': 'x' * 10, 'bio': 'x' * 100,
+                        'tags': ['a', 'b']})
+    assert form.is_valid()
+
+    error = rejected(form, {'name': 'x' * 11})
+    assert (error.eid, error.code) == ('name', 'valueTooLong')
+    assert rejected(form, {'bio': 'x' * 101}).code == 'valueTooLong'
+    error = rejected(form, {'tags': list('abcdef')})
+    assert (error.eid, error.code) == ('tags', 'tooManyValues')
+    assert rejected(form, {'name': 'x' * 10, 'bio': 'x' * 100, 'tags': ['x' * 50]}).code == \
+        'tooLarge'
+    # lists sent to single value fields are checked too
+    assert rejected(form, {'name': ['x'] * 6}).code == 'tooManyValues'
+
+    form.max_value_length = 20
+    assert rejected(form, {'tags': ['x' * 21]}).code == 'valueTooLong'
+    form.set_submitted({'f-submit-flag': 'submitted', 'tags': ['x' * 20]})
+
+    # a rejected submission doesn't set any values, the submit flag included
+    form = Form('f')
+    form.max_value_length = 10
+    form.add_text('name', 'Name')
+    form.add_text('city', 'City')
+    assert rejected(form, {'name': 'bob', 'city': 'x' * 11}).eid == 'city'
+    assert not form.is_submitted()
+    assert form.elements.name.submittedval is NotGiven
+
+    # uploads aren't values, the limits don't apply to them
+    form = Form('f')
+    form.max_values = 2
+    form.max_value_length = 9
+    form.max_total_length = 20
+    form.add_text('name', 'Name')
+    form.add_file('upload', 'Upload')
+    body = multipart.replace(b'--XyZ\r\n', b'--XyZ\r\nContent-Disposition: form-data; '
+                             b'name="f-submit-flag"\r\n\r\nsubmitted\r\n--XyZ\r\n', 1)
+    form.set_submitted_raw(body, 'multipart/form-data; boundary=XyZ')
+    assert form.is_valid()
+    assert form.elements.upload.value.file_name == 'a.txt'
+
+    # the limits by type are per form
+    assert Form.max_lengths is None
+    assert Form('g').max_lengths is None
+
+
+def test_repeat_limits():
+    form = Form('f')
+    form.max_values = 2
+    lines = form.add_repeat('lines')
+    lines.row.add_text('qty', 'Qty', 'int')
+    error = rejected(form, {'lines-%d-qty' % i: '1' for i in range(3)})
+    assert (error.eid, error.code) == ('lines', 'tooManyValues')
@@ -1,5 +1,6 @@
 from __future__ import absolute_import
 from os import path
+import threading
 from six.moves import range
 
 renderers = ('default', 'withaction', 'all_els', 'static', 'noteprefix',
@@ -58,3 +59,32 @@ def test_all():
             finally:
                 formfile.close()
             raise
+
+
+def test_render_is_repeatable():
+    for rname in renderers:
+        rmod = __import__('tests.renderers.%s' % rname, globals(), locals(), ['TestForm'])
+        tf = rmod.TestForm()
+        render_opts = getattr(rmod, 'render_opts', {})
+        attributes = dict(tf.attributes)
+        first = tf.render(**render_opts)
+        assert tf.render(**render_opts) == first, rname
+        assert tf.attributes == attributes, rname
+
+
+def test_concurrent_render():
+    rmod = __import__('tests.renderers.all_els', globals(), locals(), ['TestForm'])
+    tf = rmod.TestForm()
+    expected = tf.render()
+    results = []
+
+    def render():
+        for _ in range(5):
+            results.append(tf.render())
+    threads = [threading.Thread(target=render) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(results) == 20
+    assert all(html == expected for html in results)
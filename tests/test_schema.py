@@ -0,0 +1,134 @@
+from __future__ import absolute_import
+import decimal
+
+from blazeform.cache import LRUCache
+from blazeform.form import Form
+from blazeform.schema import form_from_schema, to_json_schema
+
+person = {
+    'type': 'object',
+    'properties': {
+        'name': {'type': 'string', 'title': 'Name', 'maxLength': 10, 'minLength': 2},
+        'email': {'type': 'string', 'format': 'email'},
+        'age': {'type': 'integer', 'minimum': 0, 'maximum': 150},
+        'height': {'type': 'number', 'minimum': 0.5},
+        'color': {'enum': ['red', 'blue'], 'default': 'blue'},
+        'tags': {'type': 'array', 'items': {'enum': ['a', 'b', 'c']}},
+        'active': {'type': 'boolean', 'description': 'Is the person active?'},
+        'code': {'type': 'string', 'pattern': '^[A-Z]+$'},
+    },
+    'required': ['name', 'email'],
+}
+
+
+def submit(form, **values):
+    values['%s-submit-flag' % form._name] = 'submitted'
+    form.set_submitted(values)
+    return form
+
+
+def test_form_from_schema():
+    form = form_from_schema(person, 'person', cache=None)
+    assert list(form.els.keys())[1:] == \
+        ['name', 'email', 'age', 'height', 'color', 'tags', 'active', 'code']
+    els = form.elements
+    assert els.name.label.value == 'Name'
+    assert els.name.required and els.email.required and not els.age.required
+    assert els.name.get_attr('maxlength') == 10
+    assert els.color.defaultval == 'blue'
+    assert els.tags.multiple
+    assert els.active.notes == ['Is the person active?']
+
+    submit(form, name='Bob', email='bob@example.com', age='42', height='1.8', color='red',
+           tags=['a', 'c'], active='on', code='ABC')
+    assert form.is_valid(), form.all_errors()
+    values = form.get_values()
+    assert values['age'] == 42
+    assert values['height'] == decimal.Decimal('1.8')
+    assert values['tags'] == ['a', 'c']
+    assert values['active'] is True
+
+    form = form_from_schema(person, 'person', cache=None)
+    submit(form, name='B', email='bob', age='200', height='0.1', color='green', code='abc')
+    assert not form.is_valid()
+    errors = form.all_errors()[1]
+    assert set(errors) == set(['Name', 'email', 'age', 'height', 'color', 'code'])
+
+
+def test_schema_cache():
+    cache = LRUCache()
+    form1 = form_from_schema(person, 'person', cache=cache)
+    form2 = form_from_schema(dict(reversed(list(person.items()))), 'person', cache=cache)
+    assert len(cache) == 1
+    # copies of the cached form
+    assert form1 is not form2
+    submit(form1, name='Bob')
+    assert form1.elements.name.value == 'Bob'
+    assert not form2.elements.name.is_submitted()
+
+    form_from_schema(person, 'other', cache=cache)
+    assert len(cache) == 2
+
+
+def test_unsupported():
+    for prop in ({'type': 'object'}, {'type': 'array', 'items': {'type': 'string'}}):
+        try:
+            form_from_schema({'properties': {'a': prop}}, 'f', cache=None)
+            assert False
+        except ValueError as e:
+            assert '"a"' in str(e)
+
+
+def test_to_json_schema():
+    form = form_from_schema(person, 'person', cache=None)
+    schema = to_json_schema(form)
+    assert schema['required'] == ['name', 'email']
+    props = schema['properties']
+    assert props['name'] == {'type': 'string', 'title': 'Name', 'maxLength': 10,
+                             'minLength': 2}
+    assert props['email'] == {'type': 'string', 'title': 'email', 'format': 'email'}
+    assert props['age'] == {'type': 'integer', 'title': 'age', 'minimum': 0, 'maximum': 150}
+    assert props['height'] == {'type': 'number', 'title': 'height', 'minimum': 0.5}
+    assert props['color'] == {'enum': ['red', 'blue'], 'title': 'color', 'default': 'blue'}
+    assert props['tags'] == {'type': 'array', 'items': {'enum': ['a', 'b', 'c']},
+                             'title': 'tags'}
+    assert props['active'] == {'type': 'boolean', 'title': 'active', 'default': False}
+    assert props['code']['pattern'] == '^[A-Z]+$'
+
+
+def test_repeat():
+    schema = {'properties': {'lines': {
+        'type': 'array', 'maxItems': 100,
+        'items': {'type': 'object', 'properties': {'qty': {'type': 'integer'}},
+                  'required': ['qty']},
+    }}}
+    form = form_from_schema(schema, 'order', cache=None)
+    lines = form.elements.lines
+    assert lines.max_rows == 100
+    assert list(lines.row.els) == ['qty']
+    submit(form, lines=[{'qty': '1'}, {'qty': '2'}])
+    assert form.get_values()['lines'] == [{'qty': 1}, {'qty': 2}]
+    props = to_json_schema(form)['properties']
+    assert props['lines'] == {'type': 'array', 'title': 'lines', 'maxItems': 100, 'items': {
+        'type': 'object', 'properties': {'qty': {'type': 'integer', 'title': 'qty'}},
+        'required': ['qty']}}
+
+
+def test_to_json_schema_handmade():
+    form = Form('f')
+    form.add_text('num', 'Number', 'int')
+    form.add_password('password', 'Password', required=True)
+    form.add_confirm('confirm', 'Confirm', match='password')
+    form.add_mcheckbox('p1', 'Read', 'read', 'perms')
+    form.add_mcheckbox('p2', 'Write', 'write', 'perms')
+    form.add_radio('r1', 'Yes', 'yes', 'answer')
+    form.add_submit('submit')
+    schema = to_json_schema(form)
+    assert schema['required'] == ['password']
+    props = schema['properties']
+    assert sorted(props) == ['answer', 'num', 'password', 'perms']
+    assert props['num']['type'] == 'integer'
+    assert props['password']['format'] == 'password'
+    assert props['perms'] == {'type': 'array', 'items': {'enum': ['read', 'write']},
+                              'title': 'perms'}
+    assert props['answer'] == {'enum': ['yes'], 'title': 'answer'}
@@ -1,9 +1,12 @@
 from __future__ import absolute_import
+import copy
 from decimal import Decimal
+import pickle
 import unittest
 
 from blazeform.util import multi_pop, NotGiven, is_iterable, NotGivenIter, \
-    is_notgiven, HtmlAttributeHolder, is_empty
+    is_notgiven, HtmlAttributeHolder, is_empty, AttributeDict, is_given, display_value, \
+    is_blank, LazyModule, LazyOrderedDict
 import six
 
 
@@ -71,6 +74,48 @@ class TestUtilFunctions(unittest.TestCase):
         assert not is_empty([0])
         assert not is_empty({'foo': 'bar'})
         assert not is_empty({''})
+        assert is_empty(b'')
+        assert is_empty(())
+        assert not is_empty(b'foo')
+
+    def test_sentinel_identity(self):
+        # copies and unpickled values are the sentinels themselves
+        for sentinel in (NotGiven, NotGivenIter):
+            assert copy.copy(sentinel) is sentinel
+            assert copy.deepcopy([sentinel])[0] is sentinel
+            assert pickle.loads(pickle.dumps(sentinel)) is sentinel
+        assert is_given(None) and is_given('')
+        assert not is_given(NotGivenIter)
+
+    def test_display_value(self):
+        assert display_value(NotGiven) is None
+        assert display_value(NotGivenIter, '') == ''
+        assert display_value('', 'x') == 'x'
+        assert display_value(0) == 0
+        assert display_value(False) is False
+        assert display_value('foo') == 'foo'
+        assert is_blank(NotGiven)
+        assert is_blank('')
+        assert not is_blank(NotGivenIter)
+        assert not is_blank(None)
+
+    def test_lazy_module(self):
+        module = LazyModule('json')
+        assert 'dumps' not in module.__dict__
+        assert module.dumps([1]) == '[1]'
+        assert module.__dict__['dumps'] is module.dumps
+
+    def test_lazy_ordered_dict(self):
+        lod = LazyOrderedDict()
+        lod.b = 1
+        lod['a'] = 2
+        assert list(lod.items()) == [('b', 1), ('a', 2)]
+        assert lod.a == 2
+        try:
+            lod.c
+            assert False
+        except AttributeError as e:
+            assert "'LazyOrderedDict' object has no attribute 'c'" in str(e)
 
 
 class TestHtmlAttributeHolder(unittest.TestCase):
@@ -113,3 +158,22 @@ class TestHtmlAttributeHolder(unittest.TestCase):
         ah.add_attr('class_', 'class2')
         assert ah.attributes['src'] == 'src'
         assert ah.attributes['class'] == 'class class2'
+
+    def test_attributes_version(self):
+        ah = HtmlAttributeHolder(src='src')
+        assert isinstance(ah.attributes, AttributeDict)
+        versions = [ah.attributes.version]
+        ah.set_attr('class', 'class')
+        versions.append(ah.attributes.version)
+        ah.attributes['foo'] = 'bar'
+        versions.append(ah.attributes.version)
+        ah.attributes.update(foo='baz')
+        versions.append(ah.attributes.version)
+        ah.del_attr('foo')
+        versions.append(ah.attributes.version)
+        assert len(set(versions)) == 5
+
+        # replacing the dict still gives a new version
+        ah.attributes = {'src': 'src'}
+        assert isinstance(ah.attributes, AttributeDict)
+        assert ah.attributes.version not in versions